@@ -0,0 +1,71 @@
+"""Performance benchmarks."""
+
+import datetime as dt
+import json
+import platform
+import subprocess
+from pathlib import Path
+
+import click
+
+Results = dict[str, float]
+"""Measured values by benchmark name."""
+
+
+def get_commit() -> str | None:
+    """Get current git commit of the working tree (if any)."""
+    try:
+        result = subprocess.run(  # noqa: S603
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+output_option = click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="JSON file to save results to",
+)
+
+compare_option = click.option(
+    "--compare",
+    "-c",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="JSON file with results to compare with",
+)
+
+
+def report(
+    results: Results,
+    unit: str,
+    output: Path | None,
+    compare: Path | None,
+    **details: object,
+) -> None:
+    """Print results compared with saved ones and save them if asked."""
+    baseline: Results = {}
+    if compare is not None:
+        baseline = json.loads(compare.read_text())["results"]
+
+    click.echo(f"{'benchmark':<28}  {unit:>9}  {'baseline':>9}  change")
+    for name, value in results.items():
+        line = f"{name:<28}  {value:>9.1f}"
+        if (before := baseline.get(name)) is not None:
+            line += f"  {before:>9.1f}  {(value - before) / before:>+6.1%}"
+        click.echo(line)
+
+    if output is not None:
+        saved = {
+            "commit": get_commit(),
+            "created": dt.datetime.now(dt.UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            **details,
+            "results": results,
+        }
+        output.write_text(json.dumps(saved, indent=2) + "\n")
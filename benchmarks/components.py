@@ -0,0 +1,222 @@
+"""
+Hot paths components benchmark.
+
+Measures auth token verification, NBP responses parsing, wallet responses
+serialization and the whole ASGI request path of the API. NBP is replaced with a
+stub transport and users wallets are served from the wallets cache filled in advance
+(which is an in-process stand-in for the database), so neither network nor Docker is
+needed. Run it as:
+
+    poetry run python -m benchmarks.components --output=before.json
+    poetry run python -m benchmarks.components --compare=before.json
+
+Results are mean times of a single call in microseconds (the best of several runs).
+"""
+
+import asyncio
+import math
+import os
+import time
+import typing as t
+from functools import partial
+from pathlib import Path
+
+import click
+import httpx
+from fastapi import FastAPI
+from fastapi.security import HTTPAuthorizationCredentials, SecurityScopes
+
+from wallet.api.auth import Scope, TokenCache, get_user_id
+from wallet.api.dependencies import get_read_engine
+from wallet.cli import create_token
+from wallet.config import get_settings
+from wallet.db import create_engine, create_replica_engine
+from wallet.db.cache import get_wallet_cache
+from wallet.main import create_app
+from wallet.rates import (
+    RateProvider,
+    create_cache,
+    create_client,
+    create_provider,
+    fetch_table,
+)
+
+from . import Results, compare_option, output_option, report
+from .serialization import TABLE, create_wallet, fast, measure, standard
+
+SIZES = (1, 5, 13, 35)
+"""Wallet sizes (number of currencies) to measure."""
+
+REPEAT = 5
+"""Number of measurements to take the best one of."""
+
+
+def nbp_handler(request: httpx.Request) -> httpx.Response:
+    """Answer NBP Web API requests with the benchmark exchange rates table."""
+    if not request.url.path.endswith("/tables/C/"):
+        return httpx.Response(404)
+    rates = [{"code": rate.code, "ask": rate.ask} for rate in TABLE.rates.values()]
+    table = {"no": TABLE.no, "effectiveDate": TABLE.date.isoformat()}
+    return httpx.Response(200, json=[table | {"table": "C", "rates": rates}])
+
+
+def create_nbp_client() -> httpx.AsyncClient:
+    """Create NBP Web API client with the stub transport."""
+    return httpx.AsyncClient(
+        base_url=get_settings().nbp_url, transport=httpx.MockTransport(nbp_handler)
+    )
+
+
+def measure_async(
+    func: t.Callable[[], t.Awaitable[object]],
+    number: int,
+    loop: asyncio.AbstractEventLoop,
+) -> float:
+    """Measure the best time of a single coroutine call in microseconds."""
+
+    async def run() -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    return min(loop.run_until_complete(run()) for _ in range(REPEAT)) / number * 1e6
+
+
+def bench_auth(number: int) -> Results:
+    """Measure auth token verification with and without the verified tokens cache."""
+    settings = get_settings()
+    token = create_token(1, (Scope.READ,), 60, "benchmark")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    scopes = SecurityScopes([Scope.READ, Scope.WRITE])
+    cached = TokenCache(1)
+    return {
+        "auth.decode": measure(
+            lambda: get_user_id(scopes, credentials, settings, TokenCache(0)), number
+        ),
+        "auth.cached": measure(
+            lambda: get_user_id(scopes, credentials, settings, cached), number
+        ),
+    }
+
+
+def bench_nbp(number: int, loop: asyncio.AbstractEventLoop) -> Results:
+    """Measure NBP Web API responses requesting and parsing via the stub transport."""
+    client = create_nbp_client()
+    try:
+        return {
+            "nbp.table": measure_async(lambda: fetch_table(client), number, loop),
+        }
+    finally:
+        loop.run_until_complete(client.aclose())
+
+
+def bench_serialization(number: int) -> Results:
+    """Measure wallet responses serialization by wallet size."""
+    results = {}
+    for size in SIZES:
+        db_wallet = create_wallet(size)
+        results[f"serialize.standard.{size}"] = measure(
+            partial(standard, db_wallet), number
+        )
+        results[f"serialize.content.{size}"] = measure(partial(fast, db_wallet), number)
+    return results
+
+
+def serve_stand_ins(
+    app: FastAPI, loop: asyncio.AbstractEventLoop
+) -> t.Callable[[], None]:
+    """
+    Serve application dependencies by stand-ins returning their cleanup function.
+
+    NBP Web API is served by the stub transport and wallets of users with IDs equal to
+    the wallet sizes are put into the wallets cache for good.
+    """
+    nbp_client = create_nbp_client()
+    rate_provider = RateProvider(nbp_client, create_cache())
+    engine = create_engine()
+    app.dependency_overrides = {
+        create_engine: lambda: engine,
+        create_replica_engine: lambda: engine,
+        get_read_engine: lambda: engine,
+        create_client: lambda: nbp_client,
+        create_provider: lambda: rate_provider,
+    }
+
+    cache = get_wallet_cache()
+    cache.ttl = math.inf
+    for size in SIZES:
+        writes = cache.begin(size)
+        cache.end(size, writes, create_wallet(size), version=1)
+
+    def cleanup() -> None:
+        loop.run_until_complete(nbp_client.aclose())
+        loop.run_until_complete(engine.dispose())
+
+    return cleanup
+
+
+def create_headers(user_id: int) -> dict[str, str]:
+    """Create authorization headers of the user."""
+    token = create_token(user_id, (Scope.READ,), 60, "benchmark")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def bench_asgi(number: int, loop: asyncio.AbstractEventLoop) -> Results:
+    """Measure the whole API request path with wallets served by the wallets cache."""
+    app = create_app()
+    cleanup = serve_stand_ins(app, loop)
+
+    async def get(client: httpx.AsyncClient, url: str, **headers: str) -> None:
+        result = await client.get(url, headers=headers)
+        if result.status_code not in {httpx.codes.OK, httpx.codes.NOT_MODIFIED}:
+            raise click.ClickException(f"{url} responded {result.status_code}")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://benchmark")
+    try:
+        for size in SIZES:
+            client.headers.update(create_headers(size))
+            results[f"asgi.wallet.{size}"] = measure_async(
+                lambda: get(client, "/wallet/"), number, loop
+            )
+        etag = loop.run_until_complete(client.get("/wallet/")).headers["ETag"]
+        results["asgi.wallet.not_modified"] = measure_async(
+            lambda: get(client, "/wallet/", if_none_match=etag), number, loop
+        )
+        results["asgi.currency"] = measure_async(
+            lambda: get(client, "/wallet/USD"), number, loop
+        )
+    finally:
+        loop.run_until_complete(client.aclose())
+        cleanup()
+    return results
+
+
+@click.command()
+@click.option("--number", "-n", type=int, default=1000, help="calls per measurement")
+@output_option
+@compare_option
+def main(number: int, output: Path | None, compare: Path | None) -> None:
+    """Measure hot paths components."""
+    # debug mode logs every DB statement and request, which is not measured
+    os.environ["WALLET_DEBUG"] = "no"
+    get_settings.cache_clear()
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = (
+            bench_auth(number)
+            | bench_nbp(number, loop)
+            | bench_serialization(number)
+            | bench_asgi(number, loop)
+        )
+    finally:
+        loop.close()
+
+    report(results, "time, us", output, compare, number=number)
+
+
+if __name__ == "__main__":
+    main()
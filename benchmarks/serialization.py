@@ -0,0 +1,91 @@
+"""
+Wallet response serialization benchmark.
+
+Compares FastAPI standard response path (validated output model, response model
+validation, JSON compatible encoder and standard JSON response) with the content
+response path used by the API. Run it as:
+
+    poetry run python -m benchmarks.serialization
+"""
+
+import datetime as dt
+import timeit
+import typing as t
+from decimal import Decimal
+from functools import partial
+
+import click
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from wallet.api import models
+from wallet.api.responses import ContentResponse
+from wallet.db.models import Currency as DbCurrency
+from wallet.rates import Rate, Table
+from wallet.rates.registry import DEFAULT_CODES
+
+DATE = dt.date(2025, 1, 7)
+
+TABLE = Table(
+    no="003/C/NBP/2025",
+    date=DATE,
+    rates={
+        code: Rate(code=code, ask=1 + index / 7, date=DATE)
+        for index, code in enumerate(sorted(DEFAULT_CODES))
+    },
+)
+
+FIELD = create_model_field("Response_read_wallet", models.Wallet, mode="serialization")
+
+
+def create_wallet(size: int) -> list[DbCurrency]:
+    """Create DB wallet with the number of currencies (rates known for 13 at most)."""
+    codes = sorted(DEFAULT_CODES) + [f"X{index:02}" for index in range(size)]
+    return [
+        DbCurrency(id=index, user_id=1, code=code, amount=Decimal("1234.56") + index)
+        for index, code in enumerate(codes[:size])
+    ]
+
+
+def standard(db_wallet: list[DbCurrency]) -> bytes:
+    """Render the wallet via FastAPI standard response path."""
+    serialization = serialize_response(
+        field=FIELD, response_content=models.Wallet.from_db(db_wallet, TABLE)
+    )
+    # nothing is awaited for endpoints being coroutines, so no event loop is needed
+    try:
+        serialization.send(None)
+    except StopIteration as result:
+        return JSONResponse(result.value).body
+    raise RuntimeError("Response serialization is suspended")
+
+
+def fast(db_wallet: list[DbCurrency]) -> bytes:
+    """Render the wallet via content response."""
+    return ContentResponse(models.Wallet.dump_db(db_wallet, TABLE)).body
+
+
+def measure(func: t.Callable[[], object], number: int) -> float:
+    """Measure the best time of a single call in microseconds."""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+@click.command()
+@click.option("--number", "-n", type=int, default=1000, help="calls per measurement")
+def main(number: int) -> None:
+    """Compare wallet response serialization paths."""
+    click.echo("currencies  standard, us  content, us  speedup")
+    for size in (1, 5, 13, 35):
+        db_wallet = create_wallet(size)
+        if standard(db_wallet) != fast(db_wallet):
+            raise click.ClickException(f"Bodies differ for {size} currencies")
+        before = measure(partial(standard, db_wallet), number)
+        after = measure(partial(fast, db_wallet), number)
+        speedup = before / after
+        click.echo(f"{size:>10}  {before:>12.1f}  {after:>11.1f}  {speedup:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Service cold start benchmark.
+
+Every measurement runs in a fresh interpreter, so nothing is imported or cached in
+advance. Measured are the import of the service command module (the service process
+starting workers), the import of the application module, application creation and
+the first and the next wallet requests served by the stand-ins of the components
+benchmark (after the warm up, except DB connections opening). Run it as:
+
+    poetry run python -m benchmarks.startup --output=before.json
+    poetry run python -m benchmarks.startup --compare=before.json
+
+Results are the best times in milliseconds. DB connections opening needs the database,
+so its time is only logged by the service itself.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+from . import Results, compare_option, output_option, report
+
+
+def measure_cli() -> Results:
+    """Measure the service command module import."""
+    start = time.perf_counter()
+    import wallet.cli  # noqa: F401
+
+    return {"import.cli": time.perf_counter() - start}
+
+
+def measure_app() -> Results:
+    """Measure the application import, creation and the first requests."""
+    start = time.perf_counter()
+    import wallet.main
+
+    imported = time.perf_counter()
+    app = wallet.main.create_app()
+    created = time.perf_counter()
+
+    import httpx
+
+    from wallet.api.dependencies import create_warmup_steps
+    from wallet.api.warmup import Warmup
+    from wallet.db import create_engine
+    from wallet.rates import create_provider
+
+    from .components import create_headers, serve_stand_ins
+
+    loop = asyncio.new_event_loop()
+    cleanup = serve_stand_ins(app, loop)
+    steps = create_warmup_steps(
+        app.dependency_overrides[create_engine](),
+        app.dependency_overrides[create_provider](),
+    )
+    del steps["pool"]  # no database is available
+    warmup = time.perf_counter()
+    loop.run_until_complete(Warmup(steps).run())
+    warmed = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", headers=create_headers(1)
+    )
+    durations = []
+    try:
+        for _ in range(2):
+            request = time.perf_counter()
+            loop.run_until_complete(client.get("/wallet/")).raise_for_status()
+            durations.append(time.perf_counter() - request)
+    finally:
+        loop.run_until_complete(client.aclose())
+        cleanup()
+        loop.close()
+
+    return {
+        "import.app": imported - start,
+        "create_app": created - imported,
+        "warmup": warmed - warmup,
+        "request.first": durations[0],
+        "request.next": durations[1],
+    }
+
+
+MEASUREMENTS = {"cli": measure_cli, "app": measure_app}
+"""Measurements run in separate processes by name."""
+
+
+def run_child(name: str) -> Results:
+    """Run measurement in a fresh interpreter returning results in milliseconds."""
+    start = time.perf_counter()
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-m", "benchmarks.startup", "--child", name],
+        capture_output=True,
+        check=True,
+        text=True,
+        # debug mode logs every request, which is not measured
+        env=os.environ | {"WALLET_DEBUG": "no"},
+    )
+    results = json.loads(result.stdout.splitlines()[-1])
+    results[f"process.{name}"] = time.perf_counter() - start
+    return {key: value * 1000 for key, value in results.items()}
+
+
+@click.command()
+@click.option("--number", "-n", type=int, default=5, help="processes per measurement")
+@click.option("--child", type=click.Choice(list(MEASUREMENTS)), hidden=True)
+@output_option
+@compare_option
+def main(
+    number: int, child: str | None, output: Path | None, compare: Path | None
+) -> None:
+    """Measure service cold start."""
+    if child is not None:
+        click.echo(json.dumps(MEASUREMENTS[child]()))
+        return
+
+    best: Results = {}
+    for _ in range(number):
+        for name in MEASUREMENTS:
+            for key, value in run_child(name).items():
+                best[key] = min(best.get(key, value), value)
+
+    report(best, "time, ms", output, compare, number=number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import threading
+import time
+
+import pytest
+
+from wallet.api.auth import TokenCache
+
+
+def test_token_cache() -> None:
+    cache = TokenCache(2)
+    now = time.time()
+    cache.put("a", {"exp": now + 60})
+    cache.put("b", {"exp": now + 60})
+    assert cache.get("a") == {"exp": now + 60}
+
+    cache.put("c", {"exp": now + 60})
+    assert cache.get("b") is None
+    assert cache.get("a")
+    assert cache.get("c")
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_token_cache__expired() -> None:
+    cache = TokenCache(2)
+    cache.put("a", {"exp": time.time() - 1})
+    assert cache.get("a") is None
+    assert cache.get("a") is None
+    assert cache.misses == 2  # noqa: PLR2004
+
+
+def test_token_cache__disabled() -> None:
+    cache = TokenCache(0)
+    cache.put("a", {"exp": time.time() + 60})
+    assert cache.get("a") is None
+
+
+def test_token_cache__evicted_meanwhile(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = TokenCache(1)
+    now = time.time()
+    cache.put("a", {"exp": now - 1})
+    evicting = threading.Thread(target=cache.put, args=("b", {"exp": now + 60}))
+
+    def clock() -> float:
+        # another verifying thread evicts the token while its expiration is checked
+        evicting.start()
+        evicting.join(0.1)
+        return now
+
+    monkeypatch.setattr(time, "time", clock)
+    assert cache.get("a") is None
+    evicting.join()
+    monkeypatch.undo()
+
+    assert cache.get("b")
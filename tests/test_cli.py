@@ -0,0 +1,112 @@
+import os
+from pathlib import Path
+
+import click
+import pytest
+import uvicorn
+from click.testing import CliRunner
+
+from wallet import cli
+from wallet.config import get_settings
+
+
+@pytest.mark.parametrize(
+    ("content", "expected"), [("150000 100000\n", 1.5), ("max 100000\n", None)]
+)
+def test_cpu_quota(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, content: str, expected: float
+) -> None:
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text(content)
+    monkeypatch.setattr(cli, "CGROUP_CPU_MAX", cpu_max)
+
+    assert cli.cpu_quota() == expected
+
+
+def test_cpu_quota__v1(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cli, "CGROUP_CPU_MAX", tmp_path / "cpu.max")
+    monkeypatch.setattr(cli, "CGROUP_CPU_QUOTA", tmp_path / "cpu.cfs_quota_us")
+    monkeypatch.setattr(cli, "CGROUP_CPU_PERIOD", tmp_path / "cpu.cfs_period_us")
+    assert cli.cpu_quota() is None
+
+    cli.CGROUP_CPU_QUOTA.write_text("200000\n")
+    cli.CGROUP_CPU_PERIOD.write_text("100000\n")
+    assert cli.cpu_quota() == 2  # noqa: PLR2004
+
+
+def test_cpu_count(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(os, "sched_getaffinity", lambda _: set(range(64)))
+    monkeypatch.setattr(cli, "cpu_quota", lambda: 1.5)
+
+    assert cli.cpu_count() == 2  # noqa: PLR2004
+
+
+def test_get_workers(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    monkeypatch.setattr(cli, "cpu_count", lambda: 64)
+    settings = get_settings()
+    monkeypatch.setattr(settings, "db_pool_size", 20)
+    monkeypatch.setattr(settings, "db_max_overflow", 10)
+    monkeypatch.setattr(settings, "db_max_connections", 100)
+
+    assert cli.get_workers() == 3  # noqa: PLR2004
+    assert "Running 3 workers instead of 64" in capsys.readouterr().err
+    assert cli.get_workers(2) == 2  # noqa: PLR2004
+    assert not capsys.readouterr().err
+
+    monkeypatch.setattr(cli, "cpu_count", lambda: 2)
+    assert cli.get_workers() == 2  # noqa: PLR2004
+    assert not capsys.readouterr().err
+    with pytest.raises(click.ClickException, match="120 DB connections"):
+        cli.get_workers(4)
+
+
+def test_service__snapshot_reset(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    snapshot = tmp_path / "rates"
+    snapshot.write_bytes(b"table of an earlier run")
+    metrics = tmp_path / "metrics"
+    metrics.mkdir()
+    (metrics / "123.json").write_text("[]")
+    settings = get_settings()
+    monkeypatch.setattr(settings, "debug", False)
+    monkeypatch.setattr(settings, "nbp_snapshot", str(snapshot))
+    monkeypatch.setattr(settings, "metrics_dir", str(metrics))
+    monkeypatch.setattr(cli, "get_workers", lambda _: 2)
+    existed = []
+    monkeypatch.setattr(
+        uvicorn,
+        "run",
+        lambda *_, **__: existed.append((snapshot.exists(), any(metrics.iterdir()))),
+    )
+
+    result = CliRunner().invoke(cli.service)
+
+    assert result.exit_code == 0, result.output
+    assert existed == [(False, False)]
+
+
+def test_service__metrics_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    settings = get_settings()
+    monkeypatch.setattr(settings, "debug", False)
+    monkeypatch.setattr(settings, "nbp_snapshot", str(tmp_path / "rates"))
+    monkeypatch.setattr(settings, "metrics_dir", None)
+    monkeypatch.delenv("WALLET_METRICS_DIR", raising=False)
+    monkeypatch.setattr(cli, "get_workers", lambda _: 2)
+    shared = []
+
+    def run(*_: object, **__: object) -> None:
+        path = Path(os.environ["WALLET_METRICS_DIR"])
+        assert path.is_dir()
+        shared.append(path)
+
+    monkeypatch.setattr(uvicorn, "run", run)
+
+    result = CliRunner().invoke(cli.service)
+
+    # workers get the directory created for them, which is removed on exit
+    assert result.exit_code == 0, result.output
+    assert len(shared) == 1
+    assert not shared[0].exists()
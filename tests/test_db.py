@@ -1,12 +1,30 @@
+import asyncio
+import datetime as dt
+import io
 from decimal import Decimal
+from pathlib import Path
 
 import pytest
-from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncEngine
 
-from wallet.db import get_session
-from wallet.db.models import Currency
-from wallet.db.services import get_currency, update_currency
+from wallet.config import get_settings
+from wallet.db import get_session, init_db, warm_up
+from wallet.db.cache import ENTRY_SIZE, ROW_SIZE, WalletCache, get_wallet_cache
+from wallet.db.models import Currency, Rate
+from wallet.db.pins import WritePins, get_write_pins
+from wallet.db.services import (
+    AmountError,
+    add_rates,
+    delete_currency,
+    get_currency,
+    get_rates,
+    get_version,
+    get_wallet,
+    update_currency,
+)
+from wallet.db.transfer import Format, TransferError, export_wallets, import_wallets
 
 
 async def test_get_currency(engine: AsyncEngine) -> None:
@@ -26,27 +44,267 @@ async def test_get_currency(engine: AsyncEngine) -> None:
 
 async def test_update_currency__success(engine: AsyncEngine) -> None:
     async with get_session(engine) as session:
-        added = await update_currency(123, "USD", Decimal("15.5"), session)
+        added, version = await update_currency(123, "USD", Decimal("15.5"), session)
 
         assert added.id
+        assert version == 1
 
         expected = Currency(
             id=added.id, user_id=123, code="USD", amount=Decimal("15.5")
         )
         assert added == expected
 
-        increased = await update_currency(123, "USD", Decimal("0.5"), session)
+        increased, version = await update_currency(123, "USD", Decimal("0.5"), session)
 
         expected.amount = Decimal("16.0")
         assert increased == expected
+        assert version == 2  # noqa: PLR2004
 
-        decreased = await update_currency(123, "USD", Decimal("-15"), session)
+        decreased, version = await update_currency(123, "USD", Decimal(-15), session)
 
         expected.amount = Decimal("1.0")
         assert decreased == expected
+        assert version == 3  # noqa: PLR2004
+        assert await get_version(123, session) == version
 
 
 async def test_update_currency__error(engine: AsyncEngine) -> None:
-    with pytest.raises(ValidationError):
-        async with get_session(engine) as session:
+    async with get_session(engine) as session:
+        with pytest.raises(AmountError):
+            await update_currency(123, "USD", Decimal("-15.5"), session)
+
+        await update_currency(123, "USD", Decimal("15.5"), session)
+        with pytest.raises(AmountError):
             await update_currency(123, "USD", Decimal("-15.5"), session)
+
+        found = await get_currency(123, "USD", session)
+
+    assert found
+    assert found.amount == Decimal("15.5")
+
+
+async def test_update_currency__not_changed(engine: AsyncEngine) -> None:
+    async with get_session(engine) as session:
+        wallet = await get_wallet(456, session)
+        with pytest.raises(AmountError):
+            await update_currency(456, "USD", Decimal(-1), session)
+        assert not await delete_currency(456, "USD", session)
+
+    assert get_wallet_cache().get(456) is wallet
+    assert not get_write_pins().is_pinned(456)
+
+
+async def test_update_currency__concurrent(engine: AsyncEngine) -> None:
+    async def add() -> None:
+        async with get_session(engine) as session:
+            await update_currency(123, "USD", Decimal(1), session)
+
+    await asyncio.gather(*(add() for _ in range(10)))
+
+    async with get_session(engine) as session:
+        found = await get_currency(123, "USD", session)
+
+    assert found
+    assert found.amount == Decimal(10)
+
+
+async def test_delete_currency(engine: AsyncEngine) -> None:
+    async with get_session(engine) as session:
+        assert not await delete_currency(123, "USD", session)
+
+        await update_currency(123, "USD", Decimal("15.5"), session)
+        assert await delete_currency(123, "USD", session) == 2  # noqa: PLR2004
+
+        assert await get_currency(123, "USD", session) is None
+
+
+async def test_rates(engine: AsyncEngine) -> None:
+    async with get_session(engine) as session:
+        assert await get_rates(session) == []
+
+        old = Rate(code="USD", ask=4.1, date=dt.date(2025, 1, 6), table_no="002")
+        new = Rate(code="USD", ask=4.2, date=dt.date(2025, 1, 7), table_no="003")
+        await add_rates([old, new], session)
+        await add_rates([new], session)
+
+        found = await get_rates(session)
+
+    assert [(rate.code, rate.ask, rate.table_no) for rate in found] == [
+        ("USD", 4.2, "003")
+    ]
+
+
+async def test_init_db__migrations(engine: AsyncEngine) -> None:
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("ALTER TABLE wallets DROP CONSTRAINT chk_positive_amount")
+        )
+
+    await init_db()
+    await init_db()
+
+    with pytest.raises(IntegrityError, match="chk_positive_amount"):
+        async with engine.begin() as connection:
+            await connection.execute(
+                text("INSERT INTO wallets (user_id, code, amount) VALUES (1, 'USD', 0)")
+            )
+
+
+async def test_warm_up(engine: AsyncEngine) -> None:
+    cache = get_wallet_cache()
+    counters = (cache.hits, cache.misses)
+    await warm_up(engine)
+
+    assert engine.pool.checkedin() == get_settings().db_pool_size  # type: ignore[attr-defined]
+    assert cache.get_version(0) is None
+    assert (cache.hits, cache.misses) == counters
+
+    async with engine.connect() as connection:
+        results = await connection.execute(
+            text("SELECT statement FROM pg_prepared_statements")
+        )
+        statements = list(results.scalars())
+    assert any("wallet_versions" in statement for statement in statements)
+    assert any("wallets.code = " in statement for statement in statements)
+
+
+async def test_get_wallet__cached(engine: AsyncEngine) -> None:
+    cache = get_wallet_cache()
+    async with get_session(engine) as session:
+        await update_currency(123, "USD", Decimal("15.5"), session)
+
+        wallet = await get_wallet(123, session)
+        assert await get_wallet(123, session) is wallet
+        assert cache.get(123) is wallet
+
+        await update_currency(123, "USD", Decimal("0.5"), session)
+        assert cache.get(123) is None
+
+        updated = await get_wallet(123, session)
+
+    assert [(item.code, item.amount) for item in updated] == [("USD", Decimal(16))]
+
+
+async def test_get_version(engine: AsyncEngine) -> None:
+    async with get_session(engine) as session:
+        assert await get_version(123, session) == 0
+
+        await update_currency(123, "USD", Decimal("15.5"), session)
+        with pytest.raises(AmountError):
+            await update_currency(123, "USD", Decimal(-20), session)
+        assert await get_version(123, session) == 1
+
+        await delete_currency(123, "USD", session)
+        await delete_currency(123, "USD", session)
+        assert await get_version(123, session) == 2  # noqa: PLR2004
+
+        await get_wallet(123, session)
+        assert get_wallet_cache().get_version(123) == 2  # noqa: PLR2004
+
+
+def test_wallet_cache__written_while_read() -> None:
+    cache = WalletCache(memory_limit=10**6, ttl=60)
+    wallet = [Currency(user_id=123, code="USD", amount=1)]
+
+    version = cache.begin(123)
+    cache.invalidate(123)
+    cache.end(123, version, wallet)
+    assert cache.get(123) is None
+
+    version = cache.begin(123)
+    cache.end(123, version, wallet)
+    assert cache.get(123) is wallet
+
+
+def test_wallet_cache__eviction() -> None:
+    cache = WalletCache(memory_limit=2 * (ENTRY_SIZE + ROW_SIZE), ttl=60)
+    for user_id in range(3):
+        cache.end(user_id, cache.begin(user_id), [Currency(user_id=user_id)])
+        cache.get(0)
+
+    assert cache.get(0)
+    assert cache.get(1) is None
+    assert cache.get(2)
+    assert cache.memory == 2 * (ENTRY_SIZE + ROW_SIZE)
+
+
+def test_wallet_cache__expired() -> None:
+    now = 0.0
+    cache = WalletCache(memory_limit=10**6, ttl=10, clock=lambda: now)
+    wallet = [Currency(user_id=123, code="USD", amount=1)]
+    cache.end(123, cache.begin(123), wallet)
+
+    now = 9.9
+    assert cache.get(123) is wallet
+    now = 10.0
+    assert cache.get(123) is None
+    assert cache.memory == 0
+
+
+def test_write_pins() -> None:
+    now = 0.0
+    pins = WritePins(window=5, clock=lambda: now)
+    pins.pin(1)
+    now = 3
+    pins.pin(2)
+
+    assert pins.is_pinned(1)
+    now = 5
+    assert not pins.is_pinned(1)
+    assert pins.is_pinned(2)
+
+    pins.pin(3)
+    assert len(pins) == 2  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("fmt", list(Format))
+async def test_export_import_wallets(
+    engine: AsyncEngine, tmp_path: Path, fmt: Format
+) -> None:
+    async with get_session(engine) as session:
+        session.add(Currency(user_id=1, code="USD", amount=Decimal("12.5")))
+        session.add(Currency(user_id=1, code="EUR", amount=Decimal("0.01")))
+        session.add(Currency(user_id=2, code="USD", amount=Decimal("99999999.99")))
+        await session.commit()
+
+    path = tmp_path / f"wallets.{fmt}"
+    with path.open("wb") as file:
+        assert await export_wallets(engine, file, fmt) == 3  # noqa: PLR2004
+    async with get_session(engine) as session:
+        await delete_currency(1, "USD", session)
+        await delete_currency(1, "EUR", session)
+        await update_currency(2, "USD", Decimal(1), session)
+        await update_currency(2, "AUD", Decimal(1), session)
+
+    with path.open("rb") as file:
+        assert await import_wallets(engine, file, fmt, replace=True) == 3  # noqa: PLR2004
+
+    async with get_session(engine) as session:
+        wallets = {
+            user_id: {
+                item.code: item.amount for item in await get_wallet(user_id, session)
+            }
+            for user_id in (1, 2)
+        }
+        assert await get_version(2, session) == 3  # noqa: PLR2004
+    assert wallets == {
+        1: {"EUR": Decimal("0.01"), "USD": Decimal("12.5")},
+        2: {"USD": Decimal("99999999.99")},
+    }
+
+
+async def test_import_wallets__invalid(engine: AsyncEngine) -> None:
+    source = io.BytesIO(b'{"user_id": 1, "code": "usd", "amount": 1}\n{"user_id": 2}\n')
+    with pytest.raises(TransferError, match="line 2"):
+        await import_wallets(engine, source, Format.NDJSON)
+
+    source = io.BytesIO(b'{"user_id": 1, "code": "usd", "amount": -1}\n')
+    with pytest.raises(TransferError, match="chk_positive_amount"):
+        await import_wallets(engine, source, Format.NDJSON)
+
+    source = io.BytesIO(b'{"user_id": 1, "code": "usd", "amount": 1.10}\n')
+    assert await import_wallets(engine, source, Format.NDJSON) == 1
+    async with get_session(engine) as session:
+        currency = await get_currency(1, "USD", session)
+    assert currency
+    assert currency.amount == Decimal("1.10")
@@ -0,0 +1,51 @@
+import httpx
+import pytest
+
+from wallet.loadtest import RATES, NbpStub, Report, create_wallets, parse_mix
+from wallet.rates import fetch_table
+
+
+def test_parse_mix() -> None:
+    assert parse_mix("wallet=7, add=3") == {"wallet": 7, "add": 3}
+
+    with pytest.raises(ValueError, match="Invalid operation weight"):
+        parse_mix("wallet=7,delete=3")
+    with pytest.raises(ValueError, match="positive weight"):
+        parse_mix("wallet=0")
+
+
+def test_create_wallets() -> None:
+    wallets = create_wallets(range(10, 20), (2, 3))
+
+    assert list(wallets) == list(range(10, 20))
+    assert all(2 <= len(wallet) <= 3 for wallet in wallets.values())  # noqa: PLR2004
+    assert wallets == create_wallets(range(10, 20), (2, 3))
+
+
+async def test_nbp_stub() -> None:
+    stub = NbpStub()
+    transport = httpx.ASGITransport(app=stub.create_app())
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://nbp/api"
+    ) as client:
+        table = await fetch_table(client)
+        assert table is not None
+        assert {code: rate.ask for code, rate in table.rates.items()} == RATES
+
+        stub.error_rate = 1
+        assert await fetch_table(client) is None
+
+    assert stub.requests == 2  # noqa: PLR2004
+
+
+def test_report() -> None:
+    report = Report(duration=2)
+    for latency in range(1, 101):
+        report.add("GET /wallet/", "200", latency / 1000)
+    report.add("POST /wallet/{currency}/sub/{amount}", "400", 0.5)
+
+    lines = list(report.lines())
+    percentiles = ["50.0", "95.0", "99.0"]
+    assert lines[1].split() == ["GET", "/wallet/", "100", "0", "50.0", *percentiles]
+    assert lines[3].split()[:3] == ["total", "101", "1"]
+    assert lines[4] == "POST /wallet/{currency}/sub/{amount} responses: 400: 1"
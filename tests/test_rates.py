@@ -0,0 +1,378 @@
+import asyncio
+import datetime as dt
+from dataclasses import replace
+from pathlib import Path
+
+import httpx
+import pytest
+from pytest_httpx import HTTPXMock
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from wallet.rates import (
+    CircuitBreaker,
+    CurrencyRegistry,
+    NotSupportedError,
+    Rate,
+    RateCache,
+    RateProvider,
+    RateRefresher,
+    SharedSnapshot,
+    Table,
+    create_client,
+    load_table,
+    store_table,
+    update_history,
+)
+from wallet.rates.breaker import State
+from wallet.rates.calendar import (
+    WARSAW,
+    business_days,
+    easter,
+    expected_date,
+    expiration,
+    is_business_day,
+)
+
+
+def warsaw(year: int, month: int, day: int, hour: int, minute: int = 0) -> dt.datetime:
+    return dt.datetime(year, month, day, hour, minute, tzinfo=WARSAW)
+
+
+def test_easter() -> None:
+    assert easter(2024) == dt.date(2024, 3, 31)
+    assert easter(2025) == dt.date(2025, 4, 20)
+    assert easter(2026) == dt.date(2026, 4, 5)
+
+
+@pytest.mark.parametrize(
+    ("day", "expected"),
+    [
+        (dt.date(2025, 1, 7), True),
+        (dt.date(2025, 1, 6), False),  # Epiphany
+        (dt.date(2025, 1, 11), False),  # Saturday
+        (dt.date(2025, 4, 21), False),  # Easter Monday
+        (dt.date(2025, 6, 19), False),  # Corpus Christi
+        (dt.date(2025, 12, 24), False),  # Christmas Eve
+        (dt.date(2024, 12, 24), True),
+    ],
+)
+def test_is_business_day(day: dt.date, expected: bool) -> None:  # noqa: FBT001
+    assert is_business_day(day) is expected
+
+
+@pytest.mark.parametrize(
+    ("effective_date", "now", "expected"),
+    [
+        # before publication: valid until today's publication
+        (dt.date(2025, 1, 3), warsaw(2025, 1, 7, 7), warsaw(2025, 1, 7, 8, 15)),
+        # after publication: valid until the next business day (skipping weekend)
+        (dt.date(2025, 1, 10), warsaw(2025, 1, 10, 9), warsaw(2025, 1, 13, 8, 15)),
+        # published ahead of the schedule: valid until the next business day
+        (dt.date(2025, 1, 10), warsaw(2025, 1, 10, 8), warsaw(2025, 1, 13, 8, 15)),
+        # after publication, but the table is late: ask again shortly
+        (dt.date(2025, 1, 9), warsaw(2025, 1, 10, 9), warsaw(2025, 1, 10, 9, 5)),
+        # holidays are skipped
+        (dt.date(2025, 4, 18), warsaw(2025, 4, 18, 12), warsaw(2025, 4, 22, 8, 15)),
+    ],
+)
+def test_expiration(
+    effective_date: dt.date, now: dt.datetime, expected: dt.datetime
+) -> None:
+    assert expiration(effective_date, now) == expected
+
+
+def test_rate_cache() -> None:
+    cache = RateCache()
+    table = Table(no="003/C/NBP/2025", date=dt.date(2025, 1, 7), rates={})
+    cache.put_table(table, now=warsaw(2025, 1, 7, 9))
+
+    assert cache.get_table(now=warsaw(2025, 1, 8, 8)) is table
+    assert cache.get_table(now=warsaw(2025, 1, 8, 8, 15)) is None
+    cache.clear()
+    assert cache.get_table(now=warsaw(2025, 1, 8, 8)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+async def test_rate_provider(nbp_mock: HTTPXMock) -> None:
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache())
+        table = await provider.get_table()
+        usd = await provider.get_rate("USD")
+        aud = await provider.get_rate("AUD")
+        with pytest.raises(NotSupportedError):
+            await provider.get_rate("AED")
+
+    assert table
+    assert table.no == "003/C/NBP/2025"
+    assert usd == Rate(code="USD", ask=4.1856, date=dt.date(2025, 1, 7))
+    assert aud == Rate(code="AUD", ask=2.6021, date=dt.date(2025, 1, 7))
+    assert len(nbp_mock.get_requests()) == 1
+
+
+async def test_single_flight__table(nbp_mock: HTTPXMock) -> None:
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache())
+        tables = await asyncio.gather(*(provider.get_table() for _ in range(10)))
+
+    assert all(table is tables[0] for table in tables)
+    assert len(nbp_mock.get_requests()) == 1
+    assert provider.flight.coalesced == 9  # noqa: PLR2004
+    assert provider.flight.in_flight == 0
+
+
+async def test_single_flight__error(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(
+        status_code=httpx.codes.SERVICE_UNAVAILABLE, is_reusable=True
+    )
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache())
+        tables = await asyncio.gather(*(provider.get_table() for _ in range(5)))
+
+    assert tables == [None] * 5
+    assert len(httpx_mock.get_requests()) == 1
+    assert provider.flight.coalesced == 4  # noqa: PLR2004
+
+
+async def test_rate_provider__stale_while_revalidate(nbp_mock: HTTPXMock) -> None:
+    stale = Table(no="002/C/NBP/2025", date=dt.date(2025, 1, 3), rates={})
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache())
+        provider.table = stale
+
+        assert await provider.get_table() is stale
+        await asyncio.gather(*provider._background)  # noqa: SLF001
+
+        fresh = await provider.get_table()
+
+    assert fresh
+    assert fresh.no == "003/C/NBP/2025"
+    assert provider.table is fresh
+    assert len(nbp_mock.get_requests()) == 1
+
+
+async def test_rate_refresher(nbp_mock: HTTPXMock) -> None:
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache())
+        refresher = RateRefresher(provider)
+
+        assert await refresher.step() == refresher.interval.total_seconds()
+        assert provider.table
+        assert provider.table.no == "003/C/NBP/2025"
+
+        # published table is up to date: wait for the next publication window
+        now = warsaw(2025, 1, 7, 12)
+        assert await refresher.step(now) == (warsaw(2025, 1, 8, 7, 45) - now).seconds
+
+        async with refresher:
+            assert refresher._task  # noqa: SLF001
+        assert refresher._task is None  # noqa: SLF001
+
+
+async def test_rate_provider__stored(engine: AsyncEngine, nbp_mock: HTTPXMock) -> None:
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache(), engine=engine)
+        fetched = await provider.get_table()
+
+    assert fetched
+    assert await load_table(engine) == fetched
+    assert len(nbp_mock.get_requests()) == 1
+
+
+async def test_rate_provider__stored_current(
+    engine: AsyncEngine, httpx_mock: HTTPXMock
+) -> None:
+    today = expected_date(dt.datetime.now(dt.UTC))
+    stored = Table(
+        no="001/C/NBP/2025",
+        date=today,
+        rates={"USD": Rate(code="USD", ask=4.1856, date=today)},
+    )
+    await store_table(engine, stored)
+
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache(), engine=engine)
+        assert await provider.get_table() == stored
+
+    assert not httpx_mock.get_requests()
+
+
+async def test_update_history(engine: AsyncEngine, httpx_mock: HTTPXMock) -> None:
+    def respond(request: httpx.Request) -> httpx.Response:
+        start, end = request.url.path.rstrip("/").split("/")[-2:]
+        days = business_days(dt.date.fromisoformat(start), dt.date.fromisoformat(end))
+        tables = [
+            {
+                "no": f"{day:%j}/C/NBP/{day:%Y}",
+                "effectiveDate": day.isoformat(),
+                "rates": [{"code": "USD", "ask": 4}],
+            }
+            for day in days
+        ]
+        return httpx.Response(200, json=tables)
+
+    httpx_mock.add_callback(respond, is_reusable=True)
+    # the table of 2024-12-31 is the one to value 2025-01-01 (a holiday) against
+    await store_table(
+        engine,
+        Table(
+            no="001/C/NBP/2025",
+            date=dt.date(2025, 1, 2),
+            rates={"USD": Rate(code="USD", ask=4, date=dt.date(2025, 1, 2))},
+        ),
+    )
+
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache())
+        start, end = dt.date(2025, 1, 1), dt.date(2025, 6, 30)
+        assert await update_history(provider, engine, start, end)
+        assert await update_history(provider, engine, start, end)
+
+    spans = [
+        request.url.path.split("/")[-3:-1] for request in httpx_mock.get_requests()
+    ]
+    assert spans == [
+        ["2024-12-31", "2024-12-31"],
+        ["2025-01-03", "2025-04-04"],
+        ["2025-04-07", "2025-06-30"],
+    ]
+
+
+def test_circuit_breaker() -> None:
+    now = 0.0
+    breaker = CircuitBreaker(
+        failure_threshold=2, recovery_timeout=10, clock=lambda: now
+    )
+    states = []
+
+    breaker.record(success=False)
+    assert breaker.allow()
+    breaker.record(success=False)
+    states.append(breaker.state)
+    assert not breaker.allow()
+
+    now = 10.0
+    assert breaker.allow()
+    states.append(breaker.state)
+    assert not breaker.allow()
+    breaker.record(success=False)
+    states.append(breaker.state)
+
+    now = 20.0
+    assert breaker.allow()
+    breaker.record(success=True)
+    states.append(breaker.state)
+
+    assert states == [State.OPEN, State.HALF_OPEN, State.OPEN, State.CLOSED]
+    assert breaker.rejected == 2  # noqa: PLR2004
+
+
+async def test_rate_provider__circuit_open(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_exception(httpx.ReadTimeout("timeout"))
+    known = Table(
+        no="002/C/NBP/2025",
+        date=dt.date(2025, 1, 3),
+        rates={"USD": Rate(code="USD", ask=4.1, date=dt.date(2025, 1, 3))},
+    )
+    async with create_client() as client:
+        provider = RateProvider(
+            client, RateCache(), breaker=CircuitBreaker(1, recovery_timeout=60)
+        )
+        provider.table = known
+
+        table = await provider.refresh()
+        assert provider.breaker.state is State.OPEN
+        assert await provider.refresh() == table
+
+    assert table
+    assert table.stale
+    assert table.get_rate("USD") == Rate(
+        code="USD", ask=4.1, date=dt.date(2025, 1, 3), stale=True
+    )
+    assert len(httpx_mock.get_requests()) == 1
+
+
+async def test_rate_provider__invalid_payload(httpx_mock: HTTPXMock) -> None:
+    httpx_mock.add_response(json=[{"table": "C", "rates": "garbage"}])
+    known = Table(no="002/C/NBP/2025", date=dt.date(2025, 1, 3), rates={})
+    now = 0.0
+    breaker = CircuitBreaker(1, recovery_timeout=60, clock=lambda: now)
+    breaker.record(success=False)
+    now = 60.0
+    async with create_client() as client:
+        provider = RateProvider(client, RateCache(), breaker=breaker)
+        provider.table = known
+
+        table = await provider.refresh()
+
+    assert table == replace(known, stale=True)
+    assert breaker.state is State.OPEN
+    now = 120.0
+    assert breaker.allow()
+
+
+def test_currency_registry() -> None:
+    registry = CurrencyRegistry()
+    assert "USD" in registry
+    assert "AED" not in registry
+
+    registry.update(
+        Table(
+            no="003/C/NBP/2025",
+            date=dt.date(2025, 1, 7),
+            rates={"AED": Rate(code="AED", ask=1.1, date=dt.date(2025, 1, 7))},
+        )
+    )
+    registry.check("AED")
+    with pytest.raises(NotSupportedError):
+        registry.check("USD")
+
+
+def test_shared_snapshot(tmp_path: Path) -> None:
+    path = str(tmp_path / "rates")
+    table = Table(
+        no="003/C/NBP/2025",
+        date=dt.date(2025, 1, 7),
+        rates={"USD": Rate(code="USD", ask=4.1856, date=dt.date(2025, 1, 7))},
+        stale=True,
+    )
+    publisher, reader = SharedSnapshot(path), SharedSnapshot(path)
+    try:
+        assert publisher.acquire()
+        assert not reader.acquire()
+        assert reader.read() is None
+
+        publisher.publish(table)
+        shared = reader.read()
+        assert shared == table
+        assert reader.read() is shared  # not decoded again until a newer generation
+
+        publisher.publish(replace(table, stale=False))
+        assert reader.read() == replace(table, stale=False)
+        assert reader.generation == 4  # noqa: PLR2004
+
+        publisher.close()
+        assert reader.acquire()
+    finally:
+        reader.close()
+
+
+async def test_rate_provider__shared_snapshot(
+    tmp_path: Path, nbp_mock: HTTPXMock
+) -> None:
+    path = str(tmp_path / "rates")
+    async with create_client() as client:
+        publisher = RateProvider(client, RateCache(), snapshot=SharedSnapshot(path))
+        reader = RateProvider(client, RateCache(), snapshot=SharedSnapshot(path))
+
+        published = await publisher.refresh()
+        assert published
+        assert await reader.refresh() == published
+
+        # newer table is picked up without waiting for the cached one to expire
+        assert publisher.snapshot
+        publisher.snapshot.publish(replace(published, no="004/C/NBP/2025"))
+        table = await reader.get_table()
+
+    assert table
+    assert table.no == "004/C/NBP/2025"
+    assert len(nbp_mock.get_requests()) == 1
@@ -1,7 +1,12 @@
 """API user authentication and authorization utils."""
 
+import hashlib
+import threading
+import time
 import typing as t
+from collections import OrderedDict
 from enum import StrEnum
+from functools import lru_cache
 
 import jwt
 from fastapi import Depends, HTTPException, Request, Response, status
@@ -11,6 +16,7 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, SecurityS
 from jwt.exceptions import InvalidSubjectError, InvalidTokenError
 
 from wallet.config import Settings, get_settings
+from wallet.timing import measure
 
 
 class Scope(StrEnum):
@@ -18,6 +24,7 @@ class Scope(StrEnum):
 
     READ = "read"
     WRITE = "write"
+    SERVICE = "service"
 
 
 class MissingScopeError(InvalidTokenError):
@@ -33,21 +40,95 @@ class MissingScopeError(InvalidTokenError):
         )
 
 
+class TokenCache:
+    """
+    Already verified auth tokens claims cache.
+
+    Tokens are identified by their digest and kept until their expiration, so the same
+    token used repeatedly is verified only once. Least recently used tokens are evicted
+    when the cache is full. Tokens are verified in the threadpool, so the cache is
+    locked.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._entries: OrderedDict[bytes, dict[str, t.Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        """Number of tokens found in the cache."""
+        self.misses = 0
+        """Number of tokens missing in the cache or expired."""
+
+    def get(self, token: str) -> dict[str, t.Any] | None:
+        """Get verified token claims if the token is known and not expired."""
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is not None:
+                if claims["exp"] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                self._entries.pop(key, None)
+            self.misses += 1
+        return None
+
+    def put(self, token: str, claims: dict[str, t.Any]) -> None:
+        """Remember verified token claims."""
+        if self.size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = claims
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of tokens found in the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=32).digest()
+
+
+@lru_cache
+def get_token_cache() -> TokenCache:
+    """Get verified auth tokens cache."""
+    return TokenCache(get_settings().token_cache_size)
+
+
+@lru_cache
+def get_public_key() -> t.Any:  # noqa: ANN401  # key type depends on the algorithm
+    """Get auth tokens signature public key parsed once."""
+    settings = get_settings()
+    algorithm = jwt.get_algorithm_by_name(settings.signing_algorithm)
+    return algorithm.prepare_key(settings.public_key)
+
+
 def get_user_id(
     security_scopes: SecurityScopes,
     http_auth_credentials: t.Annotated[
         HTTPAuthorizationCredentials, Depends(HTTPBearer())
     ],
     settings: t.Annotated[Settings, Depends(get_settings)],
+    token_cache: t.Annotated[TokenCache, Depends(get_token_cache)],
 ) -> int:
     """Validate auth token and get user ID from it."""
-    claims = jwt.decode(
-        http_auth_credentials.credentials,
-        key=settings.public_key,
-        algorithms=[settings.signing_algorithm],
-        options={"require": ["exp", "iat", "aud", "sub"]},
-        audience=settings.audience,
-    )
+    token = http_auth_credentials.credentials
+    with measure("auth"):
+        claims = token_cache.get(token)
+        if claims is None:
+            claims = jwt.decode(
+                token,
+                key=get_public_key(),
+                algorithms=[settings.signing_algorithm],
+                options={"require": ["exp", "iat", "aud", "sub"]},
+                audience=settings.audience,
+            )
+            token_cache.put(token, claims)
 
     try:
         user_id = int(claims["sub"])
@@ -0,0 +1,102 @@
+"""HTTP caching of wallet reads."""
+
+import datetime as dt
+import hashlib
+import math
+import typing as t
+
+from starlette.responses import Response
+
+from wallet.config import get_settings
+from wallet.rates import Table
+from wallet.rates.calendar import expiration
+
+VERSION_HEADER = "Wallet-Version"
+"""Header carrying the wallet version the client has written last."""
+
+VERSION_COOKIE = "wallet_version"
+"""Cookie carrying the wallet version the client has written last."""
+
+
+class Modified(t.NamedTuple):
+    """Changed wallet state known before the wallet is read."""
+
+    table: Table | None
+    """Exchange rates table to value the wallet against."""
+
+    headers: dict[str, str]
+    """Caching headers to respond with."""
+
+
+def create_etag(
+    user_id: int, version: int, table: Table | None, currency: str | None = None
+) -> str:
+    """
+    Create strong entity tag of the user wallet (or its currency) valued against rates.
+
+    The tag changes whenever the wallet is changed (its version is incremented) or the
+    rates table is replaced, so it is known before the wallet is read and valued.
+    """
+    key = (
+        f"{user_id}:{version}"
+        if currency is None
+        else f"{user_id}:{version}:{currency}"
+    )
+    if table is not None:
+        key += f":{table.no}:{table.stale}"
+    return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def is_not_modified(if_none_match: str | None, etag: str) -> bool:
+    """Check whether If-None-Match header value matches the entity tag."""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def create_headers(
+    etag: str, table: Table | None, now: dt.datetime | None = None
+) -> dict[str, str]:
+    """
+    Create caching headers of the wallet valued against the rates table.
+
+    Responses may be reused until the rates change, but not longer than the wallet
+    cache TTL, since it is the period wallet changes are allowed to be not seen for.
+    """
+    max_age = get_settings().wallet_cache_ttl
+    if table is not None:
+        now = now or dt.datetime.now(dt.UTC)
+        rates_age = (expiration(table.date, now) - now).total_seconds()
+        max_age = min(max_age, math.floor(rates_age))
+    return {"ETag": etag, "Cache-Control": f"private, max-age={max(max_age, 0)}"}
+
+
+def set_written_version(response: Response, user_id: int, version: int) -> None:
+    """
+    Tell the client the wallet version the user has just written.
+
+    Cached wallets and replica pins are kept by every service process, so the next
+    read could be served by a process knowing nothing about the write. The version is
+    sent back in the response header (for clients to send it with their reads) and in
+    a cookie (kept by browsers), so any process knows the version to read at least, as
+    long as its cached wallets or the replica could be older.
+    """
+    settings = get_settings()
+    response.headers[VERSION_HEADER] = str(version)
+    response.set_cookie(
+        VERSION_COOKIE,
+        f"{user_id}:{version}",
+        max_age=math.ceil(max(settings.db_replica_pin, settings.wallet_cache_ttl)),
+        secure=settings.secure_cookies,
+        httponly=True,
+        samesite="strict",
+    )
+
+
+def parse_version_cookie(value: str | None, user_id: int) -> int | None:
+    """Get wallet version written by the user from the cookie (if set for the user)."""
+    owner, _, version = (value or "").partition(":")
+    if owner != str(user_id) or not version.isdigit():
+        return None
+    return int(version)
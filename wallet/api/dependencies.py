@@ -1,39 +1,132 @@
 """FastAPI dependencines implementation and annotation definitions."""
 
 import typing as t
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+from pathlib import Path
 
 import httpx
-from fastapi import Depends, FastAPI, Security
+from fastapi import Cookie, Depends, FastAPI, Header, Security
 from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.concurrency import run_in_threadpool
 
-from wallet.api.auth import Scope, get_user_id
-from wallet.db import create_engine
-from wallet.rates import create_client
+from wallet.api.auth import Scope, get_public_key, get_user_id
+from wallet.config import get_settings
+from wallet.db import create_engine, create_replica_engine, warm_up
+from wallet.db.cache import get_wallet_cache
+from wallet.db.pins import get_write_pins
+from wallet.metrics import SharedMetrics, create_shared_metrics
+from wallet.rates import (
+    RateProvider,
+    RateRefresher,
+    create_cache,
+    create_client,
+    create_provider,
+    create_snapshot,
+)
+
+from . import caching
+from .warmup import Step, Warmup, create_warmup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> t.AsyncIterator[None]:
-    """Inject dependencies spanning app whole lifetime."""
+    """
+    Inject dependencies spanning app whole lifetime.
+
+    Nothing is awaited before the service starts answering, auth key parsing, DB
+    connections opening and exchange rates fetching are done by the warm up.
+    """
+    from .metrics import collect_metrics  # the metrics endpoint uses this module
+
+    settings = get_settings()
     engine = create_engine()
+    replica = create_replica_engine() if settings.db_replica else None
     nbp_client = create_client()
+    snapshot = create_snapshot()
+    rate_provider = RateProvider(
+        nbp_client, create_cache(), engine=engine, snapshot=snapshot
+    )
+    warmup = Warmup(create_warmup_steps(engine, rate_provider, replica))
+    shared = (
+        SharedMetrics(
+            Path(settings.metrics_dir),
+            partial(collect_metrics, engine, replica or engine, rate_provider),
+        )
+        if settings.metrics_dir
+        else None
+    )
 
-    async with nbp_client:
+    async with (
+        nbp_client,
+        RateRefresher(rate_provider),
+        warmup,
+        shared or nullcontext(),
+    ):
         app.dependency_overrides = {
             create_engine: lambda: engine,
+            create_replica_engine: lambda: replica or engine,
             create_client: lambda: nbp_client,
+            create_provider: lambda: rate_provider,
+            create_warmup: lambda: warmup,
+            create_shared_metrics: lambda: shared,
         }
         yield
 
+    if snapshot is not None:
+        snapshot.close()
     await engine.dispose()
+    if replica is not None:
+        await replica.dispose()
+
+
+def create_warmup_steps(
+    engine: AsyncEngine,
+    rate_provider: RateProvider,
+    replica: AsyncEngine | None = None,
+) -> dict[str, Step]:
+    """
+    Create service warm up steps.
+
+    The auth key is parsed in the thread pool as the first sync dependencies are run
+    there: the pool thread is started and the async library backend is imported (which
+    takes most of the first request time otherwise).
+    """
+
+    async def get_rates() -> None:
+        if await rate_provider.get_table() is None:
+            raise RuntimeError("Exchange rates table is not available")
+
+    steps: dict[str, Step] = {
+        "key": lambda: run_in_threadpool(get_public_key),
+        "pool": lambda: warm_up(engine),
+        "rates": get_rates,
+    }
+    if replica is not None:
+        steps["replica"] = lambda: warm_up(replica)
+    return steps
 
 
 EngineDependency = t.Annotated[AsyncEngine, Depends(create_engine)]
 """DB engine (FastAPI security dependency annotation)"""
 
+ReplicaEngineDependency = t.Annotated[AsyncEngine, Depends(create_replica_engine)]
+"""DB engine of the read-only replica (FastAPI dependency annotation)"""
+
 NbpClientDependency = t.Annotated[httpx.AsyncClient, Depends(create_client)]
 """NBP Wen API client (FastAPI security dependency annotation)"""
 
+RateProviderDependency = t.Annotated[RateProvider, Depends(create_provider)]
+"""Exchange rates provider (FastAPI dependency annotation)"""
+
+WarmupDependency = t.Annotated[Warmup, Depends(create_warmup)]
+"""Service startup warm up (FastAPI dependency annotation)"""
+
+SharedMetricsDependency = t.Annotated[
+    SharedMetrics | None, Depends(create_shared_metrics)
+]
+"""Metrics shared by service workers (FastAPI dependency annotation)"""
+
 UserIdReadScope = t.Annotated[
     int, Security(get_user_id, scopes=[Scope.READ, Scope.WRITE])
 ]
@@ -41,3 +134,52 @@ UserIdReadScope = t.Annotated[
 
 UserIdWriteScope = t.Annotated[int, Security(get_user_id, scopes=[Scope.WRITE])]
 """Current user ID with write allowed (FastAPI security dependency annotation)"""
+
+ServiceScope = t.Annotated[int, Security(get_user_id, scopes=[Scope.SERVICE])]
+"""Calling service ID with service scope (FastAPI security dependency annotation)"""
+
+
+async def get_read_engine(
+    user_id: UserIdReadScope,
+    engine: EngineDependency,
+    replica: ReplicaEngineDependency,
+    written_version: t.Annotated[
+        int | None,
+        Header(
+            alias=caching.VERSION_HEADER,
+            ge=0,
+            description="Wallet version from the last write response",
+        ),
+    ] = None,
+    version_cookie: t.Annotated[
+        str | None, Cookie(alias=caching.VERSION_COOKIE, include_in_schema=False)
+    ] = None,
+) -> AsyncEngine:
+    """
+    Get DB engine to read user wallet from: the replica unless user just wrote.
+
+    Writes done via other service processes are known from the version header (or
+    cookie) of the request: unless the wallet cached by this process is that recent,
+    it is dropped and the wallet is read from the primary database (the replica could
+    lag behind as well).
+    """
+    versions = [
+        version
+        for version in (
+            written_version,
+            caching.parse_version_cookie(version_cookie, user_id),
+        )
+        if version is not None
+    ]
+    if versions:
+        version = max(versions)
+        cache = get_wallet_cache()
+        cached = cache.get_version(user_id)
+        if cached is None or cached < version:
+            cache.invalidate(user_id)
+            return engine
+    return engine if get_write_pins().is_pinned(user_id) else replica
+
+
+ReadEngineDependency = t.Annotated[AsyncEngine, Depends(get_read_engine)]
+"""DB engine to read current user wallet from (FastAPI dependency annotation)"""
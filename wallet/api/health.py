@@ -0,0 +1,25 @@
+"""Service health checks."""
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from . import dependencies
+
+health_router = APIRouter(prefix="/health", tags=["Service monitoring"])
+
+
+@health_router.get("/live", include_in_schema=False)
+async def read_liveness() -> JSONResponse:
+    """Report the service is running."""
+    return JSONResponse({"status": "alive"})
+
+
+@health_router.get("/ready", include_in_schema=False)
+async def read_readiness(warmup: dependencies.WarmupDependency) -> JSONResponse:
+    """Report whether the service has warmed up and requests should be sent to it."""
+    if not warmup.ready:
+        return JSONResponse(
+            {"status": "warming up", "pending": sorted(warmup.pending)},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return JSONResponse({"status": "ready", "warmup": warmup.durations})
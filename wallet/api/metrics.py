@@ -0,0 +1,230 @@
+"""Service metrics collection and endpoint."""
+
+import logging
+import time
+import typing as t
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import QueuePool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from wallet.config import get_settings
+from wallet.db.cache import get_wallet_cache
+from wallet.metrics import Family, Sample, get_metrics
+from wallet.rates import RateProvider
+from wallet.rates.breaker import State
+from wallet.timing import Timings, current_timings
+
+from . import dependencies
+from .auth import get_token_cache
+
+logger = logging.getLogger("uvicorn.error")
+
+metrics_router = APIRouter(tags=["Service monitoring"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Prometheus text format content type."""
+
+
+class CacheStats(t.Protocol):
+    """Cache counting lookups."""
+
+    hits: int
+    misses: int
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of lookups answered from the cache."""
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests by route and measuring their duration."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle request recording its route, response status and duration."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            duration = time.perf_counter() - start
+            # the route is put into the scope by the router, so it is known after all
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            metrics = get_metrics()
+            metrics.requests.inc(scope["method"], path, str(status))
+            metrics.request_duration.observe(duration, scope["method"], path)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware measuring request processing phases.
+
+    Time spent in authorization, DB queries, NBP requests and response rendering is
+    reported in Server-Timing response header and logged for slow requests.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        settings = get_settings()
+        self.server_timing = settings.server_timing
+        self.threshold = settings.slow_request_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle request measuring its processing phases."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = Timings()
+        status = 500
+
+        async def send_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.header())
+            await send(message)
+
+        token = current_timings.set(timings)
+        try:
+            await self.app(scope, receive, send_timing)
+        finally:
+            current_timings.reset(token)
+            if self.threshold is not None and timings.total > self.threshold:
+                log_slow_request(scope, status, timings)
+
+
+def log_slow_request(scope: Scope, status: int, timings: Timings) -> None:
+    """Log slow request processing phases as key=value pairs."""
+    route = scope.get("route")
+    fields = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": route.path if route is not None else "unmatched",
+        "status": status,
+        "total_ms": round(timings.total * 1000, 1),
+        **{
+            f"{phase}_ms": round(duration * 1000, 1)
+            for phase, duration in timings.phases.items()
+        },
+        "queries": timings.queries,
+    }
+    logger.warning(
+        "Slow request %s", " ".join(f"{key}={value}" for key, value in fields.items())
+    )
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def read_metrics(
+    engine: dependencies.EngineDependency,
+    replica: dependencies.ReplicaEngineDependency,
+    rate_provider: dependencies.RateProviderDependency,
+    shared: dependencies.SharedMetricsDependency,
+) -> PlainTextResponse:
+    """Get service metrics (of all workers) in Prometheus text format."""
+    families = collect_metrics(engine, replica, rate_provider)
+    if shared is not None:
+        families = shared.read(families)
+    return PlainTextResponse(
+        "".join(family.render() for family in families), media_type=CONTENT_TYPE
+    )
+
+
+def collect_metrics(
+    engine: AsyncEngine, replica: AsyncEngine, rate_provider: RateProvider
+) -> list[Family]:
+    """Collect service metrics of this process."""
+    families = get_metrics().collect()
+
+    pools = {"primary": engine.pool}
+    if replica is not engine:
+        pools["replica"] = replica.pool
+    queues = {name: pool for name, pool in pools.items() if isinstance(pool, QueuePool)}
+    for name, description, stat in (
+        ("size", "DB connections pool size.", QueuePool.size),
+        ("checked_out", "DB connections in use.", QueuePool.checkedout),
+        ("checked_in", "Idle DB connections in the pool.", QueuePool.checkedin),
+        ("overflow", "DB connections opened above the pool size.", QueuePool.overflow),
+    ):
+        if queues:
+            samples: list[Sample] = [
+                (f"wallet_db_pool_{name}", {"database": database}, stat(pool))
+                for database, pool in queues.items()
+            ]
+            families.append(
+                Family(f"wallet_db_pool_{name}", "gauge", description, samples)
+            )
+
+    families.extend(collect_caches(rate_provider))
+    families.extend(collect_upstream(rate_provider))
+    return families
+
+
+def collect_caches(rate_provider: RateProvider) -> list[Family]:
+    """Collect caches lookups statistics."""
+    caches: dict[str, CacheStats] = {
+        "rates": rate_provider.cache,
+        "wallets": get_wallet_cache(),
+        "tokens": get_token_cache(),
+    }
+    hits: list[Sample] = []
+    misses: list[Sample] = []
+    ratios: list[Sample] = []
+    for name, cache in caches.items():
+        labels = {"cache": name}
+        hits.append(("wallet_cache_hits_total", labels, cache.hits))
+        misses.append(("wallet_cache_misses_total", labels, cache.misses))
+        ratios.append(("wallet_cache_hit_ratio", labels, cache.hit_ratio))
+    return [
+        Family("wallet_cache_hits_total", "counter", "Lookups found in caches.", hits),
+        Family(
+            "wallet_cache_misses_total", "counter", "Lookups missed caches.", misses
+        ),
+        Family("wallet_cache_hit_ratio", "gauge", "Share of lookups found.", ratios),
+    ]
+
+
+def collect_upstream(rate_provider: RateProvider) -> list[Family]:
+    """Collect NBP Web API requests protection statistics."""
+    breaker = rate_provider.breaker
+    states: list[Sample] = [
+        ("wallet_nbp_circuit_state", {"state": state}, int(breaker.state is state))
+        for state in State
+    ]
+    return [
+        Family(
+            "wallet_nbp_circuit_state", "gauge", "NBP circuit breaker state.", states
+        ),
+        Family(
+            "wallet_nbp_rejected_total",
+            "counter",
+            "NBP requests rejected by the open circuit breaker.",
+            [("wallet_nbp_rejected_total", {}, breaker.rejected)],
+        ),
+        Family(
+            "wallet_nbp_coalesced_total",
+            "counter",
+            "NBP requests served by joining another request in flight.",
+            [("wallet_nbp_coalesced_total", {}, rate_provider.flight.coalesced)],
+        ),
+    ]
@@ -2,11 +2,22 @@
 
 import datetime as dt
 import typing as t
-
-from pydantic import BaseModel, PlainSerializer, computed_field
+from collections.abc import Sequence
+from decimal import Decimal
+from enum import StrEnum
+
+from pydantic import (
+    BaseModel,
+    Field,
+    PlainSerializer,
+    StringConstraints,
+    computed_field,
+    model_validator,
+)
 
 from wallet.db.models import Currency as DbCurrency
-from wallet.rates import Rate
+from wallet.db.services import HistoryRow
+from wallet.rates import Rate, Table
 
 Float2Places = t.Annotated[
     float, PlainSerializer(lambda v: round(v, 4), when_used="json")
@@ -31,6 +42,9 @@ class Currency(BaseModel):
     date: dt.date | None = None
     """Exchange rate publication effective date."""
 
+    stale: bool = False
+    """Exchange rate is outdated since the current one is temporarily not available."""
+
     @computed_field
     def pln_amount(self) -> float | None:
         """Amount in the PLN if available."""
@@ -43,8 +57,36 @@ class Currency(BaseModel):
         if rate:
             result.rate = rate.ask
             result.date = rate.date
+            result.stale = rate.stale
         return result
 
+    @staticmethod
+    def dump_db(db_currency: DbCurrency, rate: Rate | None) -> dict[str, t.Any]:
+        """
+        Get JSON content of the output model created from DB one and rate.
+
+        The content is the same as the one of the model dumped in JSON mode, but the
+        model is not created and validated.
+        """
+        amount = float(db_currency.amount)
+        if rate is None:
+            return {
+                "code": db_currency.code,
+                "amount": round(amount, 4),
+                "rate": None,
+                "date": None,
+                "stale": False,
+                "pln_amount": None,
+            }
+        return {
+            "code": db_currency.code,
+            "amount": round(amount, 4),
+            "rate": round(rate.ask, 4),
+            "date": rate.date.isoformat(),
+            "stale": rate.stale,
+            "pln_amount": round(amount * rate.ask, 4),
+        }
+
 
 class Wallet(BaseModel):
     """Current wallet state."""
@@ -54,3 +96,148 @@ class Wallet(BaseModel):
 
     pln_total: Float4Places
     """Total wallet amount in PLN."""
+
+    @classmethod
+    def from_db(cls, db_wallet: Sequence[DbCurrency], table: Table | None) -> t.Self:
+        """Create output model from DB currencies valued against the rates table."""
+        wallet = [
+            Currency.from_db(
+                db_currency, table.find(db_currency.code) if table else None
+            )
+            for db_currency in db_wallet
+        ]
+        return cls(
+            wallet=wallet,
+            pln_total=sum(item.pln_amount for item in wallet if item.rate),
+        )
+
+    @staticmethod
+    def dump_db(
+        db_wallet: Sequence[DbCurrency], table: Table | None
+    ) -> dict[str, t.Any]:
+        """
+        Get JSON content of the output model created from DB currencies and the table.
+
+        The content is the same as the one of the model dumped in JSON mode, but the
+        model is not created and validated.
+        """
+        wallet = [
+            Currency.dump_db(
+                db_currency, table.find(db_currency.code) if table else None
+            )
+            for db_currency in db_wallet
+        ]
+        pln_total = sum((item["pln_amount"] for item in wallet if item["rate"]), 0.0)
+        return {"wallet": wallet, "pln_total": round(pln_total, 4)}
+
+
+class UserWallet(Wallet):
+    """Current wallet state of a user."""
+
+    user_id: int
+    """User ID."""
+
+
+class Users(BaseModel):
+    """Users to value wallets of."""
+
+    user_ids: list[int] = Field(min_length=1, max_length=100_000)
+    """User IDs (duplicates are ignored)."""
+
+
+class Valuation(BaseModel):
+    """Wallet valuation on a day."""
+
+    date: dt.date
+    """Valuation day."""
+
+    pln_amounts: dict[str, Float4Places | None]
+    """Amounts in PLN by currency code (null if no rate is known by the day)."""
+
+    pln_total: Float4Places
+    """Total wallet amount in PLN."""
+
+
+class History(BaseModel):
+    """Current wallet valuation over a period."""
+
+    history: list[Valuation]
+    """Valuations on every day of the period."""
+
+    @staticmethod
+    def dump_db(rows: Sequence[HistoryRow]) -> dict[str, t.Any]:
+        """
+        Get JSON content of the output model created from DB valuation rows.
+
+        The content is the same as the one of the model dumped in JSON mode, but the
+        model is not created and validated.
+        """
+        history = [
+            {
+                "date": day.isoformat(),
+                "pln_amounts": {
+                    code: None if value is None else round(value, 4)
+                    for code, value in zip(codes or (), values or (), strict=True)
+                },
+                "pln_total": round(total, 4),
+            }
+            for day, codes, values, total in rows
+        ]
+        return {"history": history}
+
+
+class Operation(StrEnum):
+    """Currency change operations."""
+
+    ADD = "add"
+    SUB = "sub"
+    DELETE = "delete"
+
+
+class Change(BaseModel):
+    """Single currency change."""
+
+    operation: Operation
+    """Operation to apply."""
+
+    currency: t.Annotated[
+        str, StringConstraints(min_length=3, max_length=3, to_upper=True)
+    ]
+    """ISO 4217 code."""
+
+    amount: t.Annotated[Decimal, Field(gt=0, decimal_places=2)] | None = None
+    """Amount to add or subtract (must be omitted for deletion)."""
+
+    @model_validator(mode="after")
+    def check_amount(self) -> t.Self:
+        """Check that amount is provided for add and sub operations only."""
+        if (self.amount is None) != (self.operation is Operation.DELETE):
+            raise ValueError("amount must be provided for add and sub operations only")
+        return self
+
+
+class Batch(BaseModel):
+    """Currency changes to apply at once."""
+
+    changes: list[Change] = Field(min_length=1, max_length=100)
+    """Changes in order of application."""
+
+    def merge(self) -> tuple[set[str], dict[str, Decimal]]:
+        """
+        Merge changes into currencies to remove and amounts to add to them.
+
+        Amounts of currencies to remove are counted from zero, i.e. since the last
+        removal of the currency in the batch.
+        """
+        deleted: set[str] = set()
+        amounts: dict[str, Decimal] = {}
+        for change in self.changes:
+            if change.operation is Operation.DELETE:
+                deleted.add(change.currency)
+                amounts.pop(change.currency, None)
+            else:
+                amount = t.cast(Decimal, change.amount)
+                if change.operation is Operation.SUB:
+                    amount = -amount
+                amounts[change.currency] = amounts.get(change.currency, 0) + amount
+        return deleted, amounts
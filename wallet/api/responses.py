@@ -0,0 +1,39 @@
+"""API responses rendering."""
+
+import re
+import typing as t
+
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+
+from wallet.timing import measure
+
+EXPONENT = re.compile(rb"\de")
+"""Float in exponent notation (orjson omits the exponent plus sign and zero padding)."""
+
+
+class ContentResponse(ORJSONResponse):
+    """
+    Response with JSON content of an output model rendered with orjson.
+
+    FastAPI validates data returned from endpoints against the response model, passes
+    it through JSON compatible encoder and renders with the standard JSON module.
+    Endpoints returning large output models dump them into JSON content directly
+    instead (see `dump_db` methods of the models) and return this response, which
+    renders the content several times faster.
+
+    Rendered body is the same as the one of the standard JSON response. The only
+    difference of orjson are floats in exponent notation (1e16 and above), such
+    bodies are rendered with the standard JSON module instead.
+    """
+
+    def render(self, content: t.Any) -> bytes:  # noqa: ANN401
+        """Render content as JSON."""
+        with measure("render"):
+            body = super().render(content)
+            return JSONResponse.render(self, content) if EXPONENT.search(body) else body
+
+
+class NdjsonResponse(StreamingResponse):
+    """Streamed response of newline delimited JSON objects."""
+
+    media_type = "application/x-ndjson"
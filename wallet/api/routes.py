@@ -1,51 +1,182 @@
 """API endpoints."""
 
-import asyncio
+import datetime as dt
 import typing as t
 from decimal import Decimal
 
-from fastapi import APIRouter, HTTPException, Path, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Path,
+    Query,
+    Response,
+    status,
+)
 from pydantic import AfterValidator
 from sqlalchemy.ext.asyncio import AsyncEngine
 
+from wallet.config import get_settings
 from wallet.db import get_session
 from wallet.db import services as db_services
 from wallet.db.models import Currency as DbCurrency
-from wallet.rates import NotSupportedError, Rate, get_rate
-
-from . import dependencies, models
+from wallet.rates import (
+    HISTORY_START,
+    CurrencyRegistry,
+    RateProvider,
+    get_registry,
+    update_history,
+)
+from wallet.rates.calendar import WARSAW
+
+from . import caching, dependencies, models
+from .responses import ContentResponse
 
 wallet_router = APIRouter(prefix="/wallet", tags=["User wallet operations"])
 
+IfNoneMatchAnnotation = t.Annotated[
+    str | None, Header(description="Entity tags of the wallet known to the client")
+]
+
+NOT_MODIFIED_RESPONSE: dict[int | str, dict[str, t.Any]] = {
+    status.HTTP_304_NOT_MODIFIED: {"description": "Wallet has not changed"}
+}
+
+
+async def check_modified(
+    user_id: dependencies.UserIdReadScope,
+    engine: dependencies.ReadEngineDependency,
+    rate_provider: dependencies.RateProviderDependency,
+    if_none_match: IfNoneMatchAnnotation = None,
+) -> caching.Modified:
+    """Respond 304 Not Modified if the client knows the current wallet state already."""
+    return await respond_not_modified(user_id, engine, rate_provider, if_none_match)
+
+
+async def respond_not_modified(
+    user_id: int,
+    engine: AsyncEngine,
+    rate_provider: RateProvider,
+    if_none_match: str | None,
+    currency: str | None = None,
+) -> caching.Modified:
+    """Respond 304 Not Modified if the wallet (or its currency) tag matches."""
+    async with get_session(engine) as session:
+        version = await db_services.get_version(user_id, session)
+    table = await rate_provider.get_table()
+
+    etag = caching.create_etag(user_id, version, table, currency)
+    headers = caching.create_headers(etag, table)
+    if caching.is_not_modified(if_none_match, etag):
+        # "*" matches missing currencies as well, but they must be responded 404
+        if currency is not None:
+            async with get_session(engine) as session:
+                if not await db_services.get_currency(user_id, currency, session):
+                    return caching.Modified(table=table, headers=headers)
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return caching.Modified(table=table, headers=headers)
 
-@wallet_router.get("/")
+
+ModifiedAnnotation = t.Annotated[caching.Modified, Depends(check_modified)]
+
+
+@wallet_router.get("/", response_model=models.Wallet, responses=NOT_MODIFIED_RESPONSE)
 async def read_wallet(
     user_id: dependencies.UserIdReadScope,
-    engine: dependencies.EngineDependency,
-    nbp_client: dependencies.NbpClientDependency,
-) -> models.Wallet:
-    """Get current wallet composition."""
+    engine: dependencies.ReadEngineDependency,
+    modified: ModifiedAnnotation,
+) -> ContentResponse:
+    """
+    Get current wallet composition.
+
+    Responses have entity tag, so the wallet is not sent again while neither the
+    wallet nor exchange rates have changed.
+    """
     async with get_session(engine) as session:
         db_wallet = await db_services.get_wallet(user_id, session)
 
-    rates = {
-        rate.code: rate
-        for rate in await asyncio.gather(
-            *(get_rate(nbp_client, currency.code) for currency in db_wallet),
-            return_exceptions=True,
+    return ContentResponse(
+        models.Wallet.dump_db(db_wallet, modified.table), headers=modified.headers
+    )
+
+
+@wallet_router.post("/batch", response_model=models.Wallet)
+async def apply_changes(
+    batch: models.Batch,
+    user_id: dependencies.UserIdWriteScope,
+    engine: dependencies.EngineDependency,
+    rate_provider: dependencies.RateProviderDependency,
+) -> ContentResponse:
+    """
+    Apply several currency changes at once.
+
+    All changes are applied in a single transaction: either all of them succeed or
+    the wallet is not changed at all. Changes of the same currency are merged, so only
+    the resulting amount must stay positive.
+    """
+    deleted, amounts = batch.merge()
+
+    for currency in amounts:
+        rate_provider.registry.check(currency)
+    table = await rate_provider.get_table()
+    if table:
+        for currency in amounts:
+            table.get_rate(currency)
+
+    try:
+        async with get_session(engine) as session:
+            db_wallet, version = await db_services.apply_changes(
+                user_id, deleted, amounts, session
+            )
+    except db_services.AmountError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)
+        ) from None
+
+    response = ContentResponse(models.Wallet.dump_db(db_wallet, table))
+    caching.set_written_version(response, user_id, version)
+    return response
+
+
+@wallet_router.get("/history", response_model=models.History)
+async def read_history(
+    start: t.Annotated[dt.date, Query(alias="from", title="First day of the period")],
+    user_id: dependencies.UserIdReadScope,
+    engine: dependencies.EngineDependency,
+    rate_provider: dependencies.RateProviderDependency,
+    end: t.Annotated[
+        dt.date | None, Query(alias="to", title="Last day of the period (today)")
+    ] = None,
+) -> ContentResponse:
+    """
+    Get current wallet valuation on every day of a period.
+
+    Exchange rates tables of the period are requested from NBP only once and stored,
+    every day is valued against the latest table published by it.
+    """
+    today = dt.datetime.now(WARSAW).date()
+    end = end or today
+    if not HISTORY_START <= start <= end <= today:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Period must be within {HISTORY_START} and today.",
+        )
+    if (end - start).days >= (max_days := get_settings().history_max_days):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Period must not be longer than {max_days} days.",
         )
-        if isinstance(rate, Rate)
-    }
 
-    output_wallet = [
-        models.Currency.from_db(db_currency, rates.get(db_currency.code))
-        for db_currency in db_wallet
-    ]
+    if not await update_history(rate_provider, engine, start, end):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Exchange rates history is not available at the moment.",
+        )
 
-    return models.Wallet(
-        wallet=output_wallet,
-        pln_total=sum(item.pln_amount for item in output_wallet if item.rate),
-    )
+    async with get_session(engine) as session:
+        rows = await db_services.get_history(user_id, start, end, session)
+    return ContentResponse(models.History.dump_db(rows))
 
 
 def to_upper(value: str) -> str:
@@ -59,15 +190,64 @@ CurrencyAnnotation = t.Annotated[
     AfterValidator(to_upper),
 ]
 
+SUPPORTED_CURRENCIES_KEY = "x-supported-currencies"
+"""OpenAPI schema key marking currency parameters accepting supported ones only."""
+
+
+def supported_currency(
+    currency: t.Annotated[
+        str,
+        Path(
+            title="Supported ISO 4217 3-letter currency code",
+            min_length=3,
+            max_length=3,
+            json_schema_extra={SUPPORTED_CURRENCIES_KEY: True},
+        ),
+        AfterValidator(to_upper),
+    ],
+    registry: t.Annotated[CurrencyRegistry, Depends(get_registry)],
+) -> str:
+    """Check that the currency is supported without requesting NBP."""
+    registry.check(currency)
+    return currency
+
+
+SupportedCurrencyAnnotation = t.Annotated[str, Depends(supported_currency)]
+
+
+async def check_currency_modified(
+    currency: CurrencyAnnotation,
+    user_id: dependencies.UserIdReadScope,
+    engine: dependencies.ReadEngineDependency,
+    rate_provider: dependencies.RateProviderDependency,
+    if_none_match: IfNoneMatchAnnotation = None,
+) -> caching.Modified:
+    """Respond 304 Not Modified if the client knows the currency state already."""
+    return await respond_not_modified(
+        user_id, engine, rate_provider, if_none_match, currency
+    )
 
-@wallet_router.get("/{currency}")
+
+CurrencyModifiedAnnotation = t.Annotated[
+    caching.Modified, Depends(check_currency_modified)
+]
+
+
+@wallet_router.get(
+    "/{currency}", response_model=models.Currency, responses=NOT_MODIFIED_RESPONSE
+)
 async def read_currency(
     currency: CurrencyAnnotation,
     user_id: dependencies.UserIdReadScope,
-    engine: dependencies.EngineDependency,
-    nbp_client: dependencies.NbpClientDependency,
-) -> models.Currency:
-    """Show currency state in the wallet."""
+    engine: dependencies.ReadEngineDependency,
+    modified: CurrencyModifiedAnnotation,
+) -> ContentResponse:
+    """
+    Show currency state in the wallet.
+
+    Responses have entity tag, so the currency is not sent again while neither the
+    wallet nor exchange rates have changed.
+    """
     async with get_session(engine) as session:
         db_currency = await db_services.get_currency(user_id, currency, session)
 
@@ -77,57 +257,59 @@ async def read_currency(
             detail=f"There is no {currency} in the wallet.",
         )
 
-    rate: Rate | None
-    try:
-        rate = await get_rate(nbp_client, currency)
-    except NotSupportedError:
-        rate = None
-
-    return models.Currency.from_db(db_currency, rate)
+    rate = modified.table.find(currency) if modified.table else None
+    return ContentResponse(
+        models.Currency.dump_db(db_currency, rate), headers=modified.headers
+    )
 
 
-@wallet_router.post("/{currency}/add/{amount}")
+@wallet_router.post("/{currency}/add/{amount}", response_model=models.Currency)
 async def add_amount(
-    currency: CurrencyAnnotation,
-    amount: t.Annotated[Decimal, Path(title="Amount to add", gt=0, decimal_places=2)],
+    # the user is authenticated first, so anonymous callers learn nothing else
     user_id: dependencies.UserIdWriteScope,
+    currency: SupportedCurrencyAnnotation,
+    amount: t.Annotated[Decimal, Path(title="Amount to add", gt=0, decimal_places=2)],
     engine: dependencies.EngineDependency,
-    nbp_client: dependencies.NbpClientDependency,
-) -> models.Currency:
+    rate_provider: dependencies.RateProviderDependency,
+) -> ContentResponse:
     """Add a specified amount of a currency to the wallet."""
-    rate = await get_rate(nbp_client, currency)
+    rate = await rate_provider.get_rate(currency)
 
-    db_currency = await update_amount(
+    db_currency, version = await update_amount(
         currency=currency, amount=amount, user_id=user_id, engine=engine
     )
 
-    return models.Currency.from_db(db_currency, rate)
+    response = ContentResponse(models.Currency.dump_db(db_currency, rate))
+    caching.set_written_version(response, user_id, version)
+    return response
 
 
-@wallet_router.post("/{currency}/sub/{amount}")
+@wallet_router.post("/{currency}/sub/{amount}", response_model=models.Currency)
 async def substract_amount(
-    currency: CurrencyAnnotation,
+    user_id: dependencies.UserIdWriteScope,
+    currency: SupportedCurrencyAnnotation,
     amount: t.Annotated[
         Decimal, Path(title="Amount to subtract", gt=0, decimal_places=2)
     ],
-    user_id: dependencies.UserIdWriteScope,
     engine: dependencies.EngineDependency,
-    nbp_client: dependencies.NbpClientDependency,
-) -> models.Currency:
+    rate_provider: dependencies.RateProviderDependency,
+) -> ContentResponse:
     """Substract a specified amount of a currency from the wallet."""
-    rate = await get_rate(nbp_client, currency)
+    rate = await rate_provider.get_rate(currency)
 
     try:
-        db_currency = await update_amount(
+        db_currency, version = await update_amount(
             currency=currency, amount=-amount, user_id=user_id, engine=engine
         )
-    except ValueError:
+    except db_services.AmountError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot decrease amount to zero or below.",
         ) from None
 
-    return models.Currency.from_db(db_currency, rate)
+    response = ContentResponse(models.Currency.dump_db(db_currency, rate))
+    caching.set_written_version(response, user_id, version)
+    return response
 
 
 @wallet_router.delete("/{currency}", status_code=status.HTTP_204_NO_CONTENT)
@@ -135,22 +317,24 @@ async def remove_currency(
     currency: CurrencyAnnotation,
     user_id: dependencies.UserIdWriteScope,
     engine: dependencies.EngineDependency,
+    response: Response,
 ) -> None:
     """Remove currency from the wallet."""
     async with get_session(engine) as session:
-        success = await db_services.delete_currency(user_id, currency, session)
+        version = await db_services.delete_currency(user_id, currency, session)
 
-    if not success:
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"There is no {currency} in the wallet.",
         )
+    caching.set_written_version(response, user_id, version)
 
 
 async def update_amount(
     currency: str, amount: Decimal, user_id: int, engine: AsyncEngine
-) -> DbCurrency:
-    """Update currency amount in the wallet."""
+) -> tuple[DbCurrency, int]:
+    """Update currency amount in the wallet returning it with the wallet version."""
     async with get_session(engine) as session:
         return await db_services.update_currency(
             user_id=user_id, currency=currency, add_amount=amount, session=session
@@ -0,0 +1,53 @@
+"""Service API endpoints valuing many users wallets at once."""
+
+import typing as t
+
+import orjson
+from fastapi import APIRouter, status
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from wallet.db import get_session
+from wallet.db import services as db_services
+from wallet.rates import Table
+
+from . import dependencies, models
+from .responses import NdjsonResponse
+
+valuation_router = APIRouter(prefix="/wallets", tags=["Service operations"])
+
+
+@valuation_router.post(
+    "/valuation",
+    response_class=NdjsonResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "model": models.UserWallet,
+            "description": "Users wallets, one JSON object per line",
+        }
+    },
+)
+async def value_wallets(
+    users: models.Users,
+    _: dependencies.ServiceScope,
+    engine: dependencies.EngineDependency,
+    rate_provider: dependencies.RateProviderDependency,
+) -> NdjsonResponse:
+    """
+    Get current wallets of several users.
+
+    All wallets are read by a single DB statement and valued against the same exchange
+    rates table. They are streamed in user ID order as newline delimited JSON while
+    being read, so neither wallets nor the response are kept in memory as a whole.
+    """
+    table = await rate_provider.get_table()
+    return NdjsonResponse(stream_valuation(users.user_ids, table, engine))
+
+
+async def stream_valuation(
+    user_ids: list[int], table: Table | None, engine: AsyncEngine
+) -> t.AsyncIterator[bytes]:
+    """Render users wallets as newline delimited JSON lines."""
+    async with get_session(engine) as session:
+        async for user_id, db_wallet in db_services.stream_wallets(user_ids, session):
+            content = models.Wallet.dump_db(db_wallet, table)
+            yield orjson.dumps({"user_id": user_id} | content) + b"\n"
@@ -0,0 +1,111 @@
+"""Service startup warm up."""
+
+import asyncio
+import logging
+import time
+import typing as t
+from types import TracebackType
+
+logger = logging.getLogger("uvicorn.error")
+
+Step = t.Callable[[], t.Awaitable[object]]
+"""Warm up step coroutine function (raising an exception on failure)."""
+
+RETRY_DELAY = 0.5
+"""Time in seconds to retry a failed step after (doubled after every failure)."""
+
+MAX_RETRY_DELAY = 30.0
+"""Maximal time in seconds to retry a failed step after."""
+
+
+class Warmup:
+    """
+    Background warm up of the service started together with it.
+
+    Steps (e.g. DB connections opening, exchange rates table fetching) run concurrently
+    in the background, so the service answers requests (and liveness checks) right
+    after the start. Failed steps are retried with exponential backoff until they
+    succeed, and it is reported ready once all steps succeed. Steps durations (with
+    retries) are logged to track the startup time.
+    """
+
+    def __init__(
+        self,
+        steps: dict[str, Step] | None = None,
+        retry_delay: float = RETRY_DELAY,
+        max_retry_delay: float = MAX_RETRY_DELAY,
+    ) -> None:
+        self.steps = steps or {}
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.pending = set(self.steps)
+        """Names of the steps not finished successfully yet."""
+        self.durations: dict[str, float] = {}
+        """Time in seconds spent in the finished steps by name."""
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> t.Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.stop()
+
+    @property
+    def ready(self) -> bool:
+        """All steps have finished successfully."""
+        return not self.pending
+
+    def start(self) -> None:
+        """Start warming up in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="warmup")
+
+    async def stop(self) -> None:
+        """Stop warming up if it is still in progress."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def wait(self) -> None:
+        """Wait for the started warm up to finish."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def run(self) -> None:
+        """Run all steps concurrently until they succeed logging their duration."""
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(self._step(name, step) for name, step in self.steps.items())
+        )
+        durations = ", ".join(
+            f"{name} {duration:.3f}s" for name, duration in self.durations.items()
+        )
+        logger.info(
+            "Warm up finished in %.3fs (%s)", time.perf_counter() - start, durations
+        )
+
+    async def _step(self, name: str, step: Step) -> None:
+        start = time.perf_counter()
+        delay = self.retry_delay
+        while True:
+            try:
+                await step()
+                break
+            except Exception:
+                logger.exception("Warm up step %s failed, retry in %.1fs", name, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+        self.durations[name] = time.perf_counter() - start
+        self.pending.discard(name)
+
+
+def create_warmup() -> Warmup:
+    """Get service warm up (without any steps unless started with the service)."""
+    return Warmup()
@@ -2,13 +2,20 @@
 
 import asyncio
 import datetime as dt
+import math
+import os
+import shutil
+import tempfile
+import typing as t
+from pathlib import Path
 
 import click
-import jwt
 import uvicorn
 
 from .config import get_settings
-from .db import init_db
+
+# Commands import what they need only, so the service command does not import the
+# whole application before starting worker processes, which import it on their own.
 
 
 @click.command()
@@ -17,23 +24,147 @@ from .db import init_db
 )
 def prepare(*, reset: bool = False) -> None:
     """Create or update database."""
+    from .db import init_db
+
     asyncio.get_event_loop().run_until_complete(init_db(reset=reset))
 
 
 @click.command()
-def service() -> None:
+def rates() -> None:
+    """Store current NBP exchange rates table in database."""
+    from .rates import seed_table
+
+    table = asyncio.get_event_loop().run_until_complete(seed_table())
+    if not table:
+        raise click.ClickException("NBP exchange rates table is not available")
+    click.echo(f"Stored table {table.no} effective on {table.date}")
+
+
+@click.command()
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=None,
+    help="number of worker processes (available CPUs by default)",
+)
+def service(workers: int | None = None) -> None:
     """Run web service."""
     settings = get_settings()
 
     if settings.debug:
+        from .db import init_db
+
         asyncio.get_event_loop().run_until_complete(init_db())
+        workers = 1
+    else:
+        workers = get_workers(workers or settings.workers)
+
+    snapshot = metrics = None
+    if workers > 1:
+        if settings.nbp_snapshot:
+            path = Path(settings.nbp_snapshot)
+        else:
+            # workers are spawned with the same environment, so they share the snapshot
+            snapshot = Path(tempfile.gettempdir()) / f"wallet-rates-{os.getpid()}"
+            os.environ["WALLET_NBP_SNAPSHOT"] = str(snapshot)
+            path = snapshot
+        # a table published by an earlier run must not be taken for a current one, so
+        # workers create the file anew (processes still using the old one keep it)
+        path.unlink(missing_ok=True)
+
+        if settings.metrics_dir:
+            # counters of an earlier run must not be summed with the current ones
+            for file in Path(settings.metrics_dir).glob("*.json"):
+                file.unlink(missing_ok=True)
+        else:
+            metrics = Path(tempfile.mkdtemp(prefix=f"wallet-metrics-{os.getpid()}-"))
+            os.environ["WALLET_METRICS_DIR"] = str(metrics)
+
+    try:
+        uvicorn.run(
+            "wallet.main:app",
+            port=settings.bind_port,
+            host=settings.bind_host,
+            reload=settings.debug,
+            workers=workers,
+            loop=settings.loop,
+            http=settings.http,
+            timeout_keep_alive=settings.keep_alive,
+            backlog=settings.backlog,
+            limit_concurrency=settings.limit_concurrency,
+            access_log=settings.access_log,
+        )
+    finally:
+        if snapshot is not None:
+            snapshot.unlink(missing_ok=True)
+        if metrics is not None:
+            shutil.rmtree(metrics, ignore_errors=True)
+
+
+CGROUP_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+"""Process cgroup (v2) CPU quota and period file."""
+
+CGROUP_CPU_QUOTA = Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+"""Process cgroup (v1) CPU quota file."""
+
+CGROUP_CPU_PERIOD = Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+"""Process cgroup (v1) CPU quota period file."""
 
-    uvicorn.run(
-        "wallet.main:app",
-        port=settings.bind_port,
-        host=settings.bind_host,
-        reload=settings.debug,
-    )
+
+def get_workers(workers: int | None = None) -> int:
+    """
+    Get number of service workers checking they fit into DB connections limit.
+
+    By default there is a worker per available CPU, but not more than DB connections
+    limit allows (which is reported). Explicitly requested number of workers must fit
+    into the limit.
+    """
+    settings = get_settings()
+    per_worker = settings.db_pool_size + settings.db_max_overflow
+    if workers is None:
+        cpus, limit = cpu_count(), max(settings.db_max_connections // per_worker, 1)
+        if limit < cpus:
+            click.echo(
+                f"Running {limit} workers instead of {cpus} (a CPU each), as each may"
+                f" open {per_worker} DB connections and WALLET_DB_MAX_CONNECTIONS="
+                f"{settings.db_max_connections} allows (reduce DB pool size for more)",
+                err=True,
+            )
+        return min(cpus, limit)
+    if workers * per_worker > settings.db_max_connections:
+        raise click.ClickException(
+            f"{workers} workers may open {workers * per_worker} DB connections,"
+            f" more than WALLET_DB_MAX_CONNECTIONS={settings.db_max_connections}"
+            " allows (reduce workers number or DB pool size)"
+        )
+    return workers
+
+
+def cpu_count() -> int:
+    """Get number of CPUs available to the process (limited by cgroup CPU quota)."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on every platform
+        count = os.cpu_count() or 1
+    if quota := cpu_quota():
+        count = min(count, math.ceil(quota))
+    return count
+
+
+def cpu_quota() -> float | None:
+    """Get process cgroup CPU quota in CPUs if it is limited."""
+    try:
+        if CGROUP_CPU_MAX.exists():
+            quota, period = CGROUP_CPU_MAX.read_text().split()
+        else:
+            quota = CGROUP_CPU_QUOTA.read_text().strip()
+            period = CGROUP_CPU_PERIOD.read_text().strip()
+        if quota in {"max", "-1"}:
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        return None
 
 
 @click.command()
@@ -41,13 +172,15 @@ def service() -> None:
 @click.argument("scope", nargs=-1)
 @click.option("--ttl", type=int, default=5, help="token expiration time in minutes")
 @click.option("--iss", type=str, default="manual", help="token issuer")
-def token(user_id: int, scope: tuple[str], ttl: int, iss: str) -> None:
+def token(user_id: int, scope: tuple[str, ...], ttl: int, iss: str) -> None:
     """Create user login token for test purposes."""
     click.echo(create_token(user_id, scope, ttl, iss))
 
 
-def create_token(user_id: int, scope: tuple[str], ttl: int, iss: str) -> str:
+def create_token(user_id: int, scope: tuple[str, ...], ttl: int, iss: str) -> str:
     """Create user login token."""
+    import jwt
+
     settings = get_settings()
     if not settings.private_key:
         raise RuntimeError("private key for token signing is not configured")
@@ -66,3 +199,166 @@ def create_token(user_id: int, scope: tuple[str], ttl: int, iss: str) -> str:
     return jwt.encode(
         data, key=settings.private_key, algorithm=settings.signing_algorithm
     )
+
+
+FORMAT_OPTION = click.option(
+    "--format",
+    "-f",
+    "fmt",
+    type=click.Choice(["csv", "ndjson"]),
+    default="csv",
+    help="file format: CSV with a header or JSON object per line",
+)
+
+
+@click.command(name="export")
+@click.argument("file", type=click.File("wb"), default="-")
+@FORMAT_OPTION
+def export_wallets(file: t.BinaryIO, fmt: str) -> None:
+    """Export all wallets rows (user_id, code, amount) into FILE (stdout by default)."""
+    from .db import transfer
+
+    rows, duration = asyncio.get_event_loop().run_until_complete(
+        transfer.transfer(
+            lambda engine: transfer.export_wallets(engine, file, transfer.Format(fmt))
+        )
+    )
+    report_transfer("Exported", rows, duration)
+
+
+@click.command(name="import")
+@click.argument("file", type=click.File("rb"), default="-")
+@FORMAT_OPTION
+@click.option(
+    "--replace",
+    is_flag=True,
+    default=False,
+    help="remove currencies of imported users missing in the file",
+)
+def import_wallets(file: t.BinaryIO, fmt: str, *, replace: bool = False) -> None:
+    """
+    Import wallets rows (user_id, code, amount) from FILE (stdin by default).
+
+    Imported amounts replace amounts of the same users currencies. The whole file is
+    imported in a single transaction.
+    """
+    from .db import transfer
+
+    try:
+        rows, duration = asyncio.get_event_loop().run_until_complete(
+            transfer.transfer(
+                lambda engine: transfer.import_wallets(
+                    engine, file, transfer.Format(fmt), replace=replace
+                )
+            )
+        )
+    except transfer.TransferError as error:
+        raise click.ClickException(f"Import failed: {error}") from None
+    report_transfer("Imported", rows, duration)
+
+
+def report_transfer(action: str, rows: int, duration: float) -> None:
+    """Report transferred rows number and throughput (to stderr, stdout is data)."""
+    rate = rows / duration if duration else 0
+    click.echo(f"{action} {rows} rows in {duration:.1f}s ({rate:.0f} rows/s)", err=True)
+
+
+@click.command()
+@click.option("--url", help="running service URL (the service is started otherwise)")
+@click.option(
+    "--workers", "-w", type=click.IntRange(min=1), default=1, help="service workers"
+)
+@click.option(
+    "--users", "-u", type=click.IntRange(min=1), default=1000, help="users number"
+)
+@click.option("--first-user", type=int, default=1_000_000, help="first seeded user ID")
+@click.option(
+    "--currencies",
+    type=(click.IntRange(min=0), click.IntRange(min=0)),
+    default=(1, 13),
+    help="minimal and maximal number of currencies in a wallet",
+)
+@click.option(
+    "--mix",
+    default="wallet=70,currency=20,add=5,sub=5",
+    help="operations weights (wallet, currency, add, sub)",
+)
+@click.option(
+    "--duration", "-d", type=float, default=30, help="load duration in seconds"
+)
+@click.option(
+    "--concurrency",
+    "-c",
+    type=click.IntRange(min=1),
+    default=50,
+    help="concurrent clients",
+)
+@click.option("--nbp-port", type=int, default=8090, help="NBP Web API stand-in port")
+@click.option("--nbp-latency", type=float, default=50, help="NBP mean latency in ms")
+@click.option(
+    "--nbp-error-rate", type=click.FloatRange(0, 1), default=0, help="NBP errors share"
+)
+def loadtest(  # noqa: PLR0913
+    url: str | None,
+    workers: int,
+    users: int,
+    first_user: int,
+    currencies: tuple[int, int],
+    mix: str,
+    duration: float,
+    concurrency: int,
+    nbp_port: int,
+    nbp_latency: float,
+    nbp_error_rate: float,
+) -> None:
+    """
+    Measure service throughput and latency under load.
+
+    Users wallets are seeded into the database (replacing wallets of the same users),
+    the service is requested with the operations mix by concurrent clients and
+    latency percentiles are reported by route. NBP Web API is replaced with a local
+    stand-in, which the started service uses. A running service must be started with
+    WALLET_NBP_URL pointing to the stand-in (http://127.0.0.1:NBP_PORT/api).
+    """
+    from . import loadtest as load
+    from .api.auth import Scope
+
+    try:
+        weights = load.parse_mix(mix)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--mix") from None
+
+    user_ids = range(first_user, first_user + users)
+    wallets = load.create_wallets(user_ids, currencies)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(load.seed_wallets(wallets))
+    click.echo(
+        f"Seeded {users} users with {sum(map(len, wallets.values()))} currencies"
+    )
+
+    ttl = int(duration // 60) + 10
+    scope = (Scope.READ, Scope.WRITE)
+    tokens = {
+        user_id: create_token(user_id, scope, ttl, "loadtest") for user_id in user_ids
+    }
+
+    stub = load.NbpStub(latency=nbp_latency / 1000, error_rate=nbp_error_rate)
+    with load.StubServer(stub, "127.0.0.1", nbp_port):
+        process = None
+        if url is None:
+            url = load.get_service_url()
+            process = load.start_service(
+                url, f"http://127.0.0.1:{nbp_port}/api", workers
+            )
+        try:
+            report = loop.run_until_complete(
+                load.drive_load(url, wallets, tokens, weights, duration, concurrency)
+            )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    for line in report.lines():
+        click.echo(line)
+    click.echo(f"NBP Web API stand-in requests: {stub.requests}")
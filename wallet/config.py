@@ -35,9 +35,81 @@ class Settings(BaseSettings):
     bind_port: int = 8080
     """Port to bind service to."""
 
+    workers: int | None = None
+    """Number of service worker processes (a CPU each by default, 1 in debug mode)."""
+
+    loop: t.Literal["auto", "asyncio", "uvloop"] = "auto"
+    """Event loop implementation (uvloop if installed by default)."""
+
+    http: t.Literal["auto", "h11", "httptools"] = "auto"
+    """HTTP protocol implementation (httptools if installed by default)."""
+
+    keep_alive: int = 5
+    """Time in seconds to keep idle HTTP connections open for."""
+
+    backlog: int = 2048
+    """Maximal number of pending connections."""
+
+    limit_concurrency: int | None = None
+    """Maximal number of concurrent connections per worker to respond 503 above."""
+
+    access_log: t.Annotated[bool, BeforeValidator(parse_bool)] = True
+    """Log every served request."""
+
+    server_timing: t.Annotated[bool, BeforeValidator(parse_bool)] = True
+    """Report request phases duration in Server-Timing response header."""
+
+    slow_request_threshold: float | None = None
+    """Time in seconds to log requests processed longer than (not logged by default)."""
+
+    metrics_dir: str | None = None
+    """Directory to share metrics between service workers via (set by service)."""
+
+    metrics_interval: float = 5
+    """Time in seconds service workers share their metrics after."""
+
     db: str
     """Database connection string."""
 
+    db_pool_size: int = 20
+    """Number of DB connections kept open."""
+
+    db_max_overflow: int = 10
+    """Number of DB connections allowed to be opened above the pool size."""
+
+    db_max_connections: int = 100
+    """Maximal number of DB connections all workers may open (workers * pool limit)."""
+
+    db_pool_timeout: float = 30
+    """Time in seconds to wait for a free DB connection."""
+
+    db_pool_recycle: int = 1800
+    """Time in seconds to reopen DB connections after (-1 to keep them forever)."""
+
+    db_pool_pre_ping: t.Annotated[bool, BeforeValidator(parse_bool)] = True
+    """Check DB connections liveness before use."""
+
+    db_statement_cache_size: int = 100
+    """Number of prepared statements cached per DB connection."""
+
+    db_pgbouncer: t.Annotated[bool, BeforeValidator(parse_bool)] = False
+    """Connect via PgBouncer in transaction mode (prepared statements not cached)."""
+
+    db_replica: str | None = None
+    """Read-only replica database connection string (the primary one if not set)."""
+
+    db_replica_pin: float = 5
+    """Time in seconds user wallet is read from the primary after the user writes it."""
+
+    secure_cookies: t.Annotated[bool, BeforeValidator(parse_bool)] = True
+    """Send cookies over HTTPS only (disable if the service is served over HTTP)."""
+
+    wallet_cache_memory: int = 64 * 2**20
+    """Approximate memory limit in bytes for users wallets cache (0 disables it)."""
+
+    wallet_cache_ttl: int = 10
+    """Time in seconds to cache users wallets (to see changes from other processes)."""
+
     public_key: str
     """Auth tokens signature public key."""
 
@@ -50,6 +122,9 @@ class Settings(BaseSettings):
     audience: str = "wallet-api"
     """Auth tokens expected audience."""
 
+    token_cache_size: int = 10000
+    """Maximal number of verified auth tokens to remember (0 disables caching)."""
+
     nbp_url: str = "https://api.nbp.pl/api"
     """NBP Web API URL up to API path portion."""
 
@@ -59,6 +134,21 @@ class Settings(BaseSettings):
     nbp_connection_limit: int = 20
     """NBP Web API maximal allowed concurrent connections number."""
 
+    nbp_refresh_interval: int = 60
+    """Exchange rates polling interval in seconds while the new table is expected."""
+
+    nbp_failure_threshold: int = 3
+    """NBP Web API consecutive failures number to stop requesting it for a while."""
+
+    nbp_recovery_timeout: int = 30
+    """Time in seconds to wait before requesting NBP Web API again after failures."""
+
+    nbp_snapshot: str | None = None
+    """File to share exchange rates between service workers via (set by service)."""
+
+    history_max_days: int = 366
+    """Maximal number of days of the wallet valuation history period."""
+
     model_config = SettingsConfigDict(
         env_file=".env", env_prefix="wallet_", extra="forbid"
     )
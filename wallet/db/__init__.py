@@ -1,25 +1,88 @@
 """Database operations."""
 
+import asyncio
+import typing as t
+from uuid import uuid4
+
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from wallet.config import get_settings
+from wallet.timing import instrument_engine
 
 from . import models, services
 
-__all__ = ["create_engine", "get_session", "init_db", "models", "services"]
+__all__ = [
+    "create_engine",
+    "create_replica_engine",
+    "get_session",
+    "init_db",
+    "models",
+    "services",
+    "warm_up",
+]
+
+MIGRATIONS = (
+    """
+    DO $$ BEGIN
+        ALTER TABLE wallets ADD CONSTRAINT chk_positive_amount CHECK (amount > 0);
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """,
+)
+"""
+Idempotent statements updating tables created by the previous versions.
 
+Tables are created with the current schema, but added constraints are not applied to
+the existing ones by that.
+"""
 
-def create_engine() -> AsyncEngine:
-    """Create async DB engine instance."""
+
+def create_engine(url: str | None = None) -> AsyncEngine:
+    """Create async DB engine instance (of the primary database by default)."""
     settings = get_settings()
-    return create_async_engine(settings.db, future=True, echo=settings.debug)
+    connect_args: dict[str, t.Any] = {
+        "prepared_statement_cache_size": settings.db_statement_cache_size
+    }
+    if settings.db_pgbouncer:
+        # PgBouncer in transaction mode may switch server connections between
+        # transactions, so prepared statements must not be reused or clash by name
+        connect_args = {
+            "prepared_statement_cache_size": 0,
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": unique_statement_name,
+        }
+
+    engine = create_async_engine(
+        url or settings.db,
+        future=True,
+        echo=settings.debug,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+def create_replica_engine() -> AsyncEngine:
+    """Create async DB engine of the read-only replica (the primary if not set)."""
+    return create_engine(get_settings().db_replica)
+
+
+def unique_statement_name() -> str:
+    """Generate unique prepared statement name."""
+    return f"__asyncpg_{uuid4()}__"
 
 
 def get_session(engine: AsyncEngine) -> AsyncSession:
     """Get async DB session maker."""
-    return async_sessionmaker(engine, class_=AsyncSession)()
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)()
 
 
 async def init_db(*, reset: bool = False) -> None:
@@ -29,4 +92,23 @@ async def init_db(*, reset: bool = False) -> None:
         if reset:
             await connection.run_sync(SQLModel.metadata.drop_all)
         await connection.run_sync(SQLModel.metadata.create_all)
+        for statement in MIGRATIONS:
+            await connection.execute(text(statement))
     await engine.dispose()
+
+
+async def warm_up(engine: AsyncEngine) -> None:
+    """
+    Open pool connections in advance preparing the most used statements on them.
+
+    DB errors are raised, so the warm up is retried until the database is available.
+    """
+
+    async def prepare() -> None:
+        # statements are run directly, the wallets cache would answer most of them
+        async with get_session(engine) as session:
+            await services.select_version(0, session)
+            await services.select_wallet(0, session)
+            await services.select_currency(0, "USD", session)
+
+    await asyncio.gather(*(prepare() for _ in range(get_settings().db_pool_size)))
@@ -0,0 +1,143 @@
+"""In-process wallets cache."""
+
+import time
+import typing as t
+from collections import OrderedDict
+from functools import lru_cache
+
+from wallet.config import get_settings
+
+from .models import Currency
+
+ENTRY_SIZE = 200
+"""Approximate memory size of a cache entry itself in bytes."""
+
+ROW_SIZE = 1000
+"""Approximate memory size of a cached wallet row in bytes."""
+
+
+class WalletCache:
+    """
+    Users wallets rows cache.
+
+    Wallets are invalidated on every write from this process. Since a wallet read may
+    be in progress while the wallet is written, every read takes the number of wallet
+    writes on start and its result is cached only if the number is the same on
+    finish. Writes are counted only while reads are in progress, so they take no
+    memory otherwise.
+
+    Wallet version stored in DB is cached together with the wallet rows.
+
+    Wallets written by other processes are not invalidated, so they are cached for a
+    limited time only. Least recently used wallets are evicted once approximate size of
+    the cached rows exceeds the memory limit.
+    """
+
+    def __init__(
+        self,
+        memory_limit: int,
+        ttl: float,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.memory_limit = memory_limit
+        self.ttl = ttl
+        self.clock = clock
+        self.memory = 0
+        """Approximate memory size of the cached wallets in bytes."""
+        self._entries: OrderedDict[int, tuple[list[Currency], int, float]] = (
+            OrderedDict()
+        )
+        self._writes: dict[int, int] = {}
+        self._readers: dict[int, int] = {}
+        self.hits = 0
+        """Number of wallets found in the cache."""
+        self.misses = 0
+        """Number of wallets missing in the cache."""
+
+    def get(self, user_id: int) -> list[Currency] | None:
+        """Get cached wallet if it is not expired."""
+        entry = self._lookup(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def get_version(self, user_id: int) -> int | None:
+        """Get cached wallet version if the wallet is not expired."""
+        entry = self._lookup(user_id)
+        return entry[1] if entry else None
+
+    def begin(self, user_id: int) -> int:
+        """Register wallet read start returning the number of wallet writes."""
+        self._readers[user_id] = self._readers.get(user_id, 0) + 1
+        return self._writes.get(user_id, 0)
+
+    def end(
+        self,
+        user_id: int,
+        writes: int,
+        wallet: list[Currency] | None,
+        version: int = 0,
+    ) -> None:
+        """Register wallet read finish caching the wallet if it was not written."""
+        if wallet is not None and self._writes.get(user_id, 0) == writes:
+            self._store(user_id, wallet, version)
+
+        readers = self._readers.pop(user_id) - 1
+        if readers:
+            self._readers[user_id] = readers
+        else:
+            self._writes.pop(user_id, None)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop cached wallet on write."""
+        self._drop(user_id)
+        if user_id in self._readers:
+            self._writes[user_id] = self._writes.get(user_id, 0) + 1
+
+    def clear(self) -> None:
+        """Drop all cached wallets."""
+        self._entries.clear()
+        self.memory = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of wallets found in the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _lookup(self, user_id: int) -> tuple[list[Currency], int, float] | None:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[2] <= self.clock():
+            if entry is not None:
+                self._drop(user_id)
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def _store(self, user_id: int, wallet: list[Currency], version: int) -> None:
+        size = self._size(wallet)
+        if size > self.memory_limit:
+            return
+        self._drop(user_id)
+        self._entries[user_id] = (wallet, version, self.clock() + self.ttl)
+        self.memory += size
+        while self.memory > self.memory_limit:
+            _, (evicted, _, _) = self._entries.popitem(last=False)
+            self.memory -= self._size(evicted)
+
+    def _drop(self, user_id: int) -> None:
+        if (entry := self._entries.pop(user_id, None)) is not None:
+            self.memory -= self._size(entry[0])
+
+    @staticmethod
+    def _size(wallet: list[Currency]) -> int:
+        return ENTRY_SIZE + ROW_SIZE * len(wallet)
+
+
+@lru_cache
+def get_wallet_cache() -> WalletCache:
+    """Get wallets cache."""
+    settings = get_settings()
+    return WalletCache(settings.wallet_cache_memory, settings.wallet_cache_ttl)
@@ -1,8 +1,9 @@
 """Database models."""
 
+import datetime as dt
 from decimal import Decimal
 
-from sqlmodel import Field, Index, SQLModel
+from sqlmodel import CheckConstraint, Field, Index, SQLModel
 
 
 class Currency(SQLModel, table=True):
@@ -21,4 +22,41 @@ class Currency(SQLModel, table=True):
     """Money amount in a currency."""
 
     __tablename__ = "wallets"
-    __table_args__ = (Index("unq_user_currency", "user_id", "code", unique=True),)
+    __table_args__ = (
+        Index("unq_user_currency", "user_id", "code", unique=True),
+        CheckConstraint("amount > 0", name="chk_positive_amount"),
+    )
+
+
+class WalletVersion(SQLModel, table=True):
+    """User wallet version incremented on every wallet change."""
+
+    user_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    """User ID."""
+
+    version: int = 0
+    """Number of wallet changes."""
+
+    __tablename__ = "wallet_versions"
+
+
+class Rate(SQLModel, table=True):
+    """Exchange rate published by NBP."""
+
+    id: int | None = Field(default=None, primary_key=True)
+    """Primary key."""
+
+    code: str = Field(min_length=3, max_length=3)
+    """ISO 4217 code."""
+
+    ask: float
+    """Conversion to PLN rate."""
+
+    date: dt.date
+    """Exchange rate publication effective date."""
+
+    table_no: str
+    """Number of the table the rate was published in."""
+
+    __tablename__ = "rates"
+    __table_args__ = (Index("unq_date_currency", "date", "code", unique=True),)
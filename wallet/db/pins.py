@@ -0,0 +1,53 @@
+"""Users pinned to the primary database after writes."""
+
+import time
+import typing as t
+from collections import OrderedDict
+from functools import lru_cache
+
+from wallet.config import get_settings
+
+
+class WritePins:
+    """
+    Users recently written wallets of, which are read from the primary database.
+
+    Replicas apply writes with some lag, so a wallet read from a replica right after
+    its change could be the old one. Users are pinned to the primary database for a
+    window after every write, so they always read their own writes. Pins are made by
+    this process writes only (like the wallets cache invalidation), other processes
+    learn about writes from the wallet version the client gets in a cookie.
+
+    The window is the same for all users, so pins expire in the order they are made and
+    expired ones are dropped from the oldest on every new pin.
+    """
+
+    def __init__(
+        self, window: float, clock: t.Callable[[], float] = time.monotonic
+    ) -> None:
+        self.window = window
+        self.clock = clock
+        self._deadlines: OrderedDict[int, float] = OrderedDict()
+
+    def pin(self, user_id: int) -> None:
+        """Pin the user to the primary database for the window since now."""
+        now = self.clock()
+        while self._deadlines and next(iter(self._deadlines.values())) <= now:
+            self._deadlines.popitem(last=False)
+        if self.window > 0:
+            self._deadlines[user_id] = now + self.window
+            self._deadlines.move_to_end(user_id)
+
+    def is_pinned(self, user_id: int) -> bool:
+        """Check whether the user must read from the primary database."""
+        deadline = self._deadlines.get(user_id)
+        return deadline is not None and deadline > self.clock()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+
+@lru_cache
+def get_write_pins() -> WritePins:
+    """Get users pinned to the primary database."""
+    return WritePins(get_settings().db_replica_pin)
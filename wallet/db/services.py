@@ -1,23 +1,166 @@
 """DB access functions."""
 
+import datetime as dt
+import typing as t
+from collections.abc import Iterable
 from decimal import Decimal
 
-from sqlmodel import select
+from sqlalchemy import (
+    CTE,
+    BigInteger,
+    ColumnElement,
+    Date,
+    Float,
+    Insert,
+    Numeric,
+    Row,
+    String,
+    Update,
+    any_,
+    cast,
+    column,
+    delete,
+    literal,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert
+from sqlmodel import col, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .models import Currency
+from .cache import get_wallet_cache
+from .models import Currency, Rate, WalletVersion
+from .pins import get_write_pins
+
+INSERT_CHUNK = 10000
+"""Maximal number of rows inserted by a single statement."""
+
+STREAM_CHUNK = 1000
+"""Number of rows fetched from a server side cursor at once."""
 
 
 async def get_wallet(user_id: int, session: AsyncSession) -> list[Currency]:
-    """Retrieve wallet data."""
-    results = await session.exec(select(Currency).where(Currency.user_id == user_id))
-    return results.all()  # type: ignore[return-value]  # it is 100% a list
+    """
+    Retrieve wallet data.
+
+    Wallets are cached in the process until written. Returned list must not be changed.
+    """
+    cache = get_wallet_cache()
+    if (wallet := cache.get(user_id)) is not None:
+        return wallet
+
+    writes = cache.begin(user_id)
+    wallet, version = None, 0
+    try:
+        # version is read by the same statement, so it always matches the cached wallet
+        wallet, version = await select_wallet(user_id, session)
+    finally:
+        cache.end(user_id, writes, wallet, version)
+    return wallet
+
+
+async def select_wallet(
+    user_id: int, session: AsyncSession
+) -> tuple[list[Currency], int]:
+    """Retrieve wallet data from DB together with its version."""
+    version = (
+        select(WalletVersion.version)
+        .where(WalletVersion.user_id == user_id)
+        .scalar_subquery()
+    )
+    # wallet rows are joined to a single row, so the version is read for empty ones too
+    results = await session.exec(
+        select(func.coalesce(version, 0), Currency)
+        .select_from(select(literal(1)).subquery("one"))
+        .outerjoin(Currency, col(Currency.user_id) == user_id)
+        .order_by(col(Currency.id))
+    )
+    rows = results.all()
+    return [db_currency for _, db_currency in rows if db_currency], rows[0][0]
+
+
+async def stream_wallets(
+    user_ids: Iterable[int], session: AsyncSession
+) -> t.AsyncIterator[tuple[int, list[Currency]]]:
+    """
+    Retrieve wallets of several users by a single statement.
+
+    Rows are fetched from a server side cursor in user ID order, so only one wallet is
+    kept at a time however many users are requested. Wallets are yielded in user ID
+    order, users without currencies get empty ones.
+    """
+    ordered = sorted(set(user_ids))
+    if not ordered:
+        return
+    statement = (
+        select(Currency)
+        .where(col(Currency.user_id) == any_(literal(ordered, ARRAY(BigInteger))))
+        .order_by(col(Currency.user_id), col(Currency.id))
+    )
+    results = await session.stream_scalars(
+        statement, execution_options={"yield_per": STREAM_CHUNK}
+    )
+    users = iter(ordered)
+    user_id = next(users)
+    wallet: list[Currency] = []
+    async for db_currency in results:
+        while user_id != db_currency.user_id:
+            yield user_id, wallet
+            user_id, wallet = next(users), []
+        wallet.append(db_currency)
+    yield user_id, wallet
+    for user_id in users:
+        yield user_id, []
+
+
+async def get_version(user_id: int, session: AsyncSession) -> int:
+    """Retrieve wallet version (from the cached wallet if available)."""
+    if (version := get_wallet_cache().get_version(user_id)) is not None:
+        return version
+    return await select_version(user_id, session)
+
+
+async def select_version(user_id: int, session: AsyncSession) -> int:
+    """Retrieve wallet version changed on every wallet write."""
+    results = await session.exec(
+        select(WalletVersion.version).where(WalletVersion.user_id == user_id)
+    )
+    return results.first() or 0
+
+
+def increment_versions(user_ids: ColumnElement[int]) -> CTE:
+    """
+    Create statement part incrementing versions of wallets of the users.
+
+    It is attached to the wallet write statement as a data-modifying CTE, so the write
+    takes a single round-trip and versions are incremented only if the write succeeds.
+    The CTE returns new versions (by user ID).
+    """
+    statement = insert(WalletVersion).from_select(
+        ["user_id", "version"], select(user_ids, literal(1)).distinct()
+    )
+    return (
+        statement.on_conflict_do_update(
+            index_elements=["user_id"], set_={"version": WalletVersion.version + 1}
+        )
+        .returning(col(WalletVersion.user_id), col(WalletVersion.version))
+        .cte("versions")
+    )
 
 
 async def get_currency(
     user_id: int, currency: str, session: AsyncSession
 ) -> Currency | None:
-    """Retrieve single currency from wallet."""
+    """Retrieve single currency from wallet (from the cached wallet if available)."""
+    if (wallet := get_wallet_cache().get(user_id)) is not None:
+        return next((item for item in wallet if item.code == currency), None)
+    return await select_currency(user_id, currency, session)
+
+
+async def select_currency(
+    user_id: int, currency: str, session: AsyncSession
+) -> Currency | None:
+    """Retrieve single currency from wallet in DB."""
     statement = (
         select(Currency)
         .where(Currency.user_id == user_id)
@@ -27,35 +170,264 @@ async def get_currency(
     return results.first()
 
 
+class AmountError(ValueError):
+    """Currency amount cannot be decreased to zero or below."""
+
+
 async def update_currency(
     user_id: int, currency: str, add_amount: Decimal, session: AsyncSession
-) -> Currency:
+) -> tuple[Currency, int]:
     """
-    Update single currency in a wallet.
+    Update single currency in a wallet returning it with the new wallet version.
 
     Add amount could be positive, in this case currency will be added to the wallet if
     not exists there already. In other case this currency must exist already in the
-    wallet.
-    """
-    record = await get_currency(user_id=user_id, currency=currency, session=session)
+    wallet and have enough amount to stay positive.
 
-    if not record:
-        record = Currency(user_id=user_id, code=currency, amount=add_amount)
+    Update is done by a single atomic statement, so concurrent updates of the same
+    currency are safe.
+    """
+    statement: Insert | Update
+    if add_amount > 0:
+        insert_statement = insert(Currency).values(
+            user_id=user_id, code=currency, amount=add_amount
+        )
+        statement = insert_statement.on_conflict_do_update(
+            index_elements=["user_id", "code"],
+            set_={"amount": Currency.amount + insert_statement.excluded.amount},
+        )
     else:
-        record.amount += add_amount
-    Currency.model_validate(record)
+        statement = (
+            update(Currency)
+            .where(col(Currency.user_id) == user_id)
+            .where(col(Currency.code) == currency)
+            .where(col(Currency.amount) + add_amount > 0)
+            .values(amount=Currency.amount + add_amount)
+        )
+
+    changed = statement.returning(Currency).cte("changed")
+    versions = increment_versions(changed.c.user_id)
+    results = await session.exec(  # type: ignore[call-overload]  # DML is fine too
+        select(Currency, col(WalletVersion.version)).from_statement(
+            changed.select()
+            .add_columns(versions.c.version)
+            .join_from(changed, versions, versions.c.user_id == changed.c.user_id)
+        ),
+        execution_options={"populate_existing": True},
+    )
+    row: Row[tuple[Currency, int]] | None = results.one_or_none()
+    if row is None:
+        await session.rollback()
+        raise AmountError("Cannot decrease amount to zero or below")
 
-    session.add(record)
     await session.commit()
-    await session.refresh(record)
-    return record
-
-
-async def delete_currency(user_id: int, currency: str, session: AsyncSession) -> bool:
-    """Remove currency from a wallet returning operation success."""
-    record = await get_currency(user_id=user_id, currency=currency, session=session)
-    if record:
-        await session.delete(record)
-        await session.commit()
-        return True
-    return False
+    get_wallet_cache().invalidate(user_id)
+    get_write_pins().pin(user_id)
+    return row[0], row[1]
+
+
+async def delete_currency(
+    user_id: int, currency: str, session: AsyncSession
+) -> int | None:
+    """Remove currency from a wallet returning new wallet version (None if absent)."""
+    changed = (
+        delete(Currency)
+        .where(col(Currency.user_id) == user_id)
+        .where(col(Currency.code) == currency)
+        .returning(col(Currency.user_id))
+        .cte("changed")
+    )
+    versions = increment_versions(changed.c.user_id)
+    results = await session.exec(select(versions.c.version))
+    version: int | None = results.first()
+    if version is None:
+        await session.rollback()
+        return None
+
+    await session.commit()
+    get_wallet_cache().invalidate(user_id)
+    get_write_pins().pin(user_id)
+    return version
+
+
+async def apply_changes(
+    user_id: int,
+    deleted: set[str],
+    amounts: dict[str, Decimal],
+    session: AsyncSession,
+) -> tuple[list[Currency], int]:
+    """
+    Apply several changes to a wallet in a single transaction.
+
+    The changed wallet is returned with its new version.
+
+    Deleted currencies are removed first, then amounts are added to currencies. Every
+    step is a single set-based statement. If any currency amount would not stay
+    positive nothing is changed.
+    """
+    if deleted:
+        await session.exec(  # type: ignore[call-overload]  # DML is fine too
+            delete(Currency)
+            .where(col(Currency.user_id) == user_id)
+            .where(col(Currency.code).in_(deleted))
+        )
+
+    increased = [
+        {"user_id": user_id, "code": code, "amount": amount}
+        for code, amount in amounts.items()
+        if amount > 0
+    ]
+    if increased:
+        insert_statement = insert(Currency).values(increased)
+        await session.exec(  # type: ignore[call-overload]  # DML is fine too
+            insert_statement.on_conflict_do_update(
+                index_elements=["user_id", "code"],
+                set_={"amount": Currency.amount + insert_statement.excluded.amount},
+            )
+        )
+
+    decreased = [(code, amount) for code, amount in amounts.items() if amount < 0]
+    if decreased:
+        changes = values(
+            column("code", String), column("amount", Numeric), name="changes"
+        ).data(decreased)
+        results = await session.exec(  # type: ignore[call-overload]  # DML is fine too
+            update(Currency)
+            .where(col(Currency.user_id) == user_id)
+            .where(col(Currency.code) == changes.c.code)
+            .where(col(Currency.amount) + changes.c.amount > 0)
+            .values(amount=Currency.amount + changes.c.amount)
+            .returning(col(Currency.code))
+        )
+        updated = set(results.scalars())
+        if failed := sorted(code for code, _ in decreased if code not in updated):
+            raise AmountError(
+                f"Cannot decrease amount of {', '.join(failed)} to zero or below"
+            )
+
+    # versions are joined to the wallet, so the version is returned for empty ones too
+    versions = increment_versions(literal(user_id, BigInteger))
+    results = await session.exec(
+        select(versions.c.version, Currency)
+        .outerjoin(Currency, col(Currency.user_id) == versions.c.user_id)
+        .order_by(col(Currency.id))
+    )
+    rows = results.all()
+    await session.commit()
+    get_wallet_cache().invalidate(user_id)
+    get_write_pins().pin(user_id)
+    return [db_currency for _, db_currency in rows if db_currency], rows[0][0]
+
+
+async def replace_wallets(
+    wallets: dict[int, dict[str, Decimal]], session: AsyncSession
+) -> None:
+    """Replace users wallets as a whole in a single transaction."""
+    user_ids = list(wallets)
+    await session.exec(  # type: ignore[call-overload]  # DML is fine too
+        delete(Currency).where(col(Currency.user_id).in_(user_ids))
+    )
+    rows = [
+        {"user_id": user_id, "code": code, "amount": amount}
+        for user_id, wallet in wallets.items()
+        for code, amount in wallet.items()
+    ]
+    # statement parameters number is limited, so rows are inserted in chunks
+    for start in range(0, len(rows), INSERT_CHUNK):
+        await session.exec(  # type: ignore[call-overload]  # DML is fine too
+            insert(Currency).values(rows[start : start + INSERT_CHUNK])
+        )
+    for start in range(0, len(user_ids), INSERT_CHUNK):
+        statement = insert(WalletVersion).values(
+            [
+                {"user_id": user_id, "version": 1}
+                for user_id in user_ids[start : start + INSERT_CHUNK]
+            ]
+        )
+        await session.exec(  # type: ignore[call-overload]  # DML is fine too
+            statement.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"version": WalletVersion.version + 1},
+            )
+        )
+    await session.commit()
+    cache = get_wallet_cache()
+    for user_id in user_ids:
+        cache.invalidate(user_id)
+
+
+async def get_rates(session: AsyncSession) -> list[Rate]:
+    """Retrieve the latest stored exchange rates table."""
+    latest = select(func.max(Rate.date)).scalar_subquery()
+    results = await session.exec(select(Rate).where(Rate.date == latest))
+    return results.all()  # type: ignore[return-value]  # it is 100% a list
+
+
+async def add_rates(rates: list[Rate], session: AsyncSession) -> None:
+    """Store exchange rates skipping already stored ones."""
+    if not rates:
+        return
+    statement = (
+        insert(Rate)
+        .values([rate.model_dump(exclude={"id"}) for rate in rates])
+        .on_conflict_do_nothing(index_elements=["date", "code"])
+    )
+    await session.exec(statement)  # type: ignore[call-overload]  # DML is fine too
+    await session.commit()
+
+
+async def get_rate_dates(
+    start: dt.date, end: dt.date, session: AsyncSession
+) -> set[dt.date]:
+    """Retrieve effective dates of exchange rates tables stored within the period."""
+    results = await session.exec(
+        select(col(Rate.date)).where(col(Rate.date).between(start, end)).distinct()
+    )
+    return set(results.all())
+
+
+HistoryRow = Row[tuple[dt.date, list[str] | None, list[float | None] | None, float]]
+"""Wallet valuation on a day: the day, currency codes, their PLN values and total."""
+
+
+async def get_history(
+    user_id: int, start: dt.date, end: dt.date, session: AsyncSession
+) -> list[HistoryRow]:
+    """
+    Retrieve current wallet valuation in PLN on every day of the period.
+
+    Amounts are valued against the latest rates stored by every day in a single
+    set-based statement across all days and currencies. Codes and values of a day are
+    ordered by code, values are null if no rate is stored by the day. Codes and values
+    are null for an empty wallet.
+    """
+    days = (
+        func.generate_series(0, (end - start).days)
+        .table_valued("offset")
+        .render_derived("days")
+    )
+    day = literal(start, Date) + days.c.offset
+    ask = (
+        select(Rate.ask)
+        .where(col(Rate.code) == col(Currency.code))
+        .where(col(Rate.date) <= day)
+        .order_by(col(Rate.date).desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    value = cast(Currency.amount, Float) * ask
+    code = col(Currency.code)
+    statement = (
+        select(
+            day,
+            func.array_agg(aggregate_order_by(code, code)).filter(code.is_not(None)),
+            func.array_agg(aggregate_order_by(value, code)).filter(code.is_not(None)),
+            func.coalesce(func.sum(value), 0.0),
+        )
+        .select_from(days)
+        .outerjoin(Currency, col(Currency.user_id) == user_id)
+        .group_by(days.c.offset)
+        .order_by(days.c.offset)
+    )
+    results = await session.exec(statement)
+    return results.all()  # type: ignore[return-value]  # it is 100% a list
@@ -0,0 +1,173 @@
+"""Bulk wallets import and export via PostgreSQL COPY protocol."""
+
+import csv
+import io
+import json
+import time
+import typing as t
+from contextlib import asynccontextmanager
+from enum import StrEnum
+
+import asyncpg  # type: ignore[import-untyped]
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from . import create_engine
+
+COPY_CHUNK = 10000
+"""Number of NDJSON lines converted into CSV for COPY at once."""
+
+COLUMNS = ("user_id", "code", "amount")
+"""Transferred wallets table columns."""
+
+
+class TransferError(ValueError):
+    """Wallets rows cannot be imported."""
+
+
+class Format(StrEnum):
+    """Supported transfer file formats."""
+
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+
+EXPORT_QUERIES = {
+    Format.CSV: "SELECT user_id, code, amount FROM wallets ORDER BY user_id, code",
+    # text COPY format escapes backslashes and control characters only, which do not
+    # appear in JSON objects of wallet rows
+    Format.NDJSON: (
+        "SELECT json_build_object('user_id', user_id, 'code', code, 'amount', amount)"
+        " FROM wallets ORDER BY user_id, code"
+    ),
+}
+"""Wallets rows queries by export format."""
+
+CREATE_STAGING = """
+CREATE TEMPORARY TABLE wallets_import (
+    id bigserial, user_id bigint NOT NULL, code text NOT NULL, amount numeric NOT NULL
+) ON COMMIT DROP
+"""
+"""Staging table imported rows are copied into (dropped with the transaction)."""
+
+MERGE_IMPORTED = """
+WITH deleted AS (
+    DELETE FROM wallets
+    WHERE $1 AND user_id IN (SELECT user_id FROM wallets_import) AND NOT EXISTS (
+        SELECT FROM wallets_import
+        WHERE wallets_import.user_id = wallets.user_id
+        AND upper(wallets_import.code) = wallets.code
+    )
+    RETURNING user_id
+), merged AS (
+    INSERT INTO wallets (user_id, code, amount)
+    SELECT user_id, code, amount FROM (
+        SELECT DISTINCT ON (user_id, upper(code)) user_id, upper(code) AS code, amount
+        FROM wallets_import
+        ORDER BY user_id, upper(code), id DESC
+    ) AS imported
+    WHERE NOT EXISTS (
+        SELECT FROM wallets
+        WHERE wallets.user_id = imported.user_id
+        AND wallets.code = imported.code
+        AND wallets.amount = imported.amount
+    )
+    ON CONFLICT (user_id, code) DO UPDATE SET amount = excluded.amount
+    WHERE wallets.amount <> excluded.amount
+    RETURNING user_id
+)
+INSERT INTO wallet_versions (user_id, version)
+SELECT DISTINCT user_id, 1 FROM (
+    SELECT user_id FROM deleted UNION ALL SELECT user_id FROM merged
+) AS changed
+ON CONFLICT (user_id) DO UPDATE SET version = wallet_versions.version + 1
+"""
+"""Merge of staged rows into wallets incrementing versions of changed ones."""
+
+
+async def export_wallets(engine: AsyncEngine, output: t.BinaryIO, fmt: Format) -> int:
+    """
+    Write all wallets rows into the file returning the number of rows.
+
+    Rows are streamed by the database in the requested format (CSV with a header or
+    a JSON object per line), so they are not kept in memory.
+    """
+    options = {"format": "csv", "header": True} if fmt is Format.CSV else {}
+    async with connect(engine) as driver:
+        status: str = await driver.copy_from_query(
+            EXPORT_QUERIES[fmt], output=output, **options
+        )
+    return int(status.split()[-1])
+
+
+async def import_wallets(
+    engine: AsyncEngine, source: t.BinaryIO, fmt: Format, *, replace: bool = False
+) -> int:
+    """
+    Merge wallets rows from the file into the wallets returning the number of rows.
+
+    Rows are copied into a temporary staging table and merged from there by a single
+    statement: imported amounts replace amounts of the same user currencies (the last
+    row wins for repeated ones), currency codes are uppercased. With replacing, other
+    currencies of the imported users are removed. Rows equal to the stored ones are
+    skipped and only versions of the changed wallets are incremented, so importing the
+    same data again is cheap. Everything is done in a single transaction, so invalid
+    rows (e.g. not positive amounts) fail the whole import.
+    """
+    try:
+        async with connect(engine) as driver, driver.transaction():
+            await driver.execute(CREATE_STAGING)
+            status: str = await driver.copy_to_table(
+                "wallets_import",
+                source=source if fmt is Format.CSV else ndjson_to_csv(source),
+                columns=COLUMNS,
+                format="csv",
+                header=fmt is Format.CSV,
+            )
+            # plans of the merge joins depend on the staged rows number
+            await driver.execute("ANALYZE wallets_import")
+            await driver.execute(MERGE_IMPORTED, replace)
+    except asyncpg.PostgresError as exc:
+        raise TransferError(str(exc)) from None
+    return int(status.split()[-1])
+
+
+async def ndjson_to_csv(source: t.BinaryIO) -> t.AsyncIterator[bytes]:
+    """Convert wallets rows from JSON objects per line into CSV chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            # amounts are kept as written instead of being rounded to floats
+            row = json.loads(line, parse_float=str)
+            writer.writerow([row[column] for column in COLUMNS])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise TransferError(f"Invalid wallet row on line {number}: {exc}") from None
+        if number % COPY_CHUNK == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+@asynccontextmanager
+async def connect(engine: AsyncEngine) -> t.AsyncIterator[t.Any]:
+    """Get asyncpg connection from the engine pool (SQLAlchemy does not COPY)."""
+    async with engine.connect() as connection:
+        raw = await connection.get_raw_connection()
+        yield raw.driver_connection
+
+
+async def transfer(
+    call: t.Callable[[AsyncEngine], t.Awaitable[int]],
+) -> tuple[int, float]:
+    """Run transfer with a new DB engine returning rows number and time in seconds."""
+    engine = create_engine()
+    try:
+        start = time.perf_counter()
+        rows = await call(engine)
+        return rows, time.perf_counter() - start
+    finally:
+        await engine.dispose()
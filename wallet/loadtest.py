@@ -0,0 +1,298 @@
+"""Service load testing against a local NBP Web API stand-in."""
+
+import asyncio
+import datetime as dt
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import typing as t
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from .config import get_settings
+from .db import create_engine, get_session
+from .db import services as db_services
+from .rates.calendar import WARSAW, expected_date
+from .rates.registry import DEFAULT_CODES
+
+OPERATIONS = {
+    "wallet": ("GET", "/wallet/"),
+    "currency": ("GET", "/wallet/{currency}"),
+    "add": ("POST", "/wallet/{currency}/add/{amount}"),
+    "sub": ("POST", "/wallet/{currency}/sub/{amount}"),
+}
+"""Load operations HTTP methods and route templates by name."""
+
+RATES = {
+    code: round(1 + index / 7, 4) for index, code in enumerate(sorted(DEFAULT_CODES))
+}
+"""Exchange rates served by NBP Web API stand-in by currency code."""
+
+PERCENTILES = (50, 95, 99)
+"""Reported latency percentiles."""
+
+
+@dataclass(kw_only=True)
+class NbpStub:
+    """NBP Web API stand-in serving exchange rates table C of supported currencies."""
+
+    latency: float = 0
+    """Mean response latency in seconds (actual one is from 0.5 to 1.5 of it)."""
+
+    error_rate: float = 0
+    """Share of requests answered with 503 Service Unavailable."""
+
+    requests: int = 0
+    """Number of requests served."""
+
+    def create_app(self) -> Starlette:
+        """Create ASGI application serving NBP Web API exchange rates resources."""
+        return Starlette(
+            routes=[
+                Route("/api/exchangerates/tables/C/", self.table),
+            ]
+        )
+
+    async def table(self, request: Request) -> Response:  # noqa: ARG002
+        """Respond with exchange rates table."""
+        if error := await self.respond():
+            return error
+        table = {
+            "table": "C",
+            "no": f"{self.date:%j}/C/NBP/{self.date:%Y}",
+            "effectiveDate": self.date.isoformat(),
+            "rates": [{"code": code, "ask": ask} for code, ask in RATES.items()],
+        }
+        return JSONResponse([table])
+
+    async def respond(self) -> Response | None:
+        """Wait for the response latency and decide whether it is an error."""
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))  # noqa: S311
+        if random.random() < self.error_rate:  # noqa: S311
+            return Response("Service Unavailable", status_code=503)
+        return None
+
+    @property
+    def date(self) -> dt.date:
+        """Effective date of the current table."""
+        return expected_date(dt.datetime.now(WARSAW))
+
+
+class StubServer(uvicorn.Server):
+    """Uvicorn server running NBP Web API stand-in in a background thread."""
+
+    def __init__(self, stub: NbpStub, host: str, port: int) -> None:
+        super().__init__(
+            uvicorn.Config(stub.create_app(), host=host, port=port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self) -> t.Self:
+        self.thread.start()
+        while not self.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("NBP Web API stand-in has not started")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.should_exit = True
+        self.thread.join()
+
+
+def create_wallets(
+    users: range, currencies: tuple[int, int], seed: int = 0
+) -> dict[int, dict[str, Decimal]]:
+    """Create users wallets of random supported currencies and amounts."""
+    rng = random.Random(seed)  # noqa: S311
+    codes = sorted(DEFAULT_CODES)
+    low, high = currencies
+    return {
+        user_id: {
+            code: Decimal(rng.randrange(10_000, 1_000_000)) / 100
+            for code in rng.sample(codes, rng.randint(low, min(high, len(codes))))
+        }
+        for user_id in users
+    }
+
+
+async def seed_wallets(wallets: dict[int, dict[str, Decimal]]) -> None:
+    """Store users wallets in DB replacing existing ones."""
+    engine = create_engine()
+    try:
+        async with get_session(engine) as session:
+            await db_services.replace_wallets(wallets, session)
+    finally:
+        await engine.dispose()
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    """Parse operations mix as comma separated name=weight pairs."""
+    weights = {}
+    for pair in mix.split(","):
+        name, _, weight = pair.partition("=")
+        if name.strip() not in OPERATIONS or not weight.strip().isdigit():
+            raise ValueError(f"Invalid operation weight {pair!r}")
+        weights[name.strip()] = int(weight)
+    if not any(weights.values()):
+        raise ValueError("At least one operation must have positive weight")
+    return weights
+
+
+@dataclass
+class Report:
+    """Load test results."""
+
+    duration: float = 0
+    """Load duration in seconds."""
+
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    """Response times in seconds by route."""
+
+    statuses: dict[str, Counter[str]] = field(default_factory=dict)
+    """Responses number by status code (or error name) by route."""
+
+    def add(self, route: str, status: str, latency: float) -> None:
+        """Add response result."""
+        self.latencies.setdefault(route, []).append(latency)
+        self.statuses.setdefault(route, Counter())[status] += 1
+
+    def lines(self) -> t.Iterator[str]:
+        """Render report table lines."""
+        percentiles = "".join(f"  {f'p{q}, ms':>8}" for q in PERCENTILES)
+        yield f"{'route':<38}  {'requests':>8}  {'errors':>6}  {'rps':>8}{percentiles}"
+        total = []
+        for route, latencies in sorted(self.latencies.items()):
+            total.extend(latencies)
+            yield self._line(route, latencies, self._errors(self.statuses[route]))
+        errors = sum(self._errors(statuses) for statuses in self.statuses.values())
+        yield self._line("total", total, errors)
+
+        for route, statuses in sorted(self.statuses.items()):
+            if self._errors(statuses):
+                counts = ", ".join(f"{key}: {value}" for key, value in statuses.items())
+                yield f"{route} responses: {counts}"
+
+    def _line(self, route: str, latencies: list[float], errors: int) -> str:
+        latencies.sort()
+        rps = len(latencies) / self.duration if self.duration else 0
+        values = "".join(
+            f"  {percentile(latencies, q) * 1000:>8.1f}" for q in PERCENTILES
+        )
+        return f"{route:<38}  {len(latencies):>8}  {errors:>6}  {rps:>8.1f}{values}"
+
+    @staticmethod
+    def _errors(statuses: Counter[str]) -> int:
+        return sum(count for key, count in statuses.items() if not key.startswith("2"))
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """Get nearest-rank percentile of ordered values."""
+    if not ordered:
+        return math.nan
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+async def run_load(  # noqa: PLR0913
+    client: httpx.AsyncClient,
+    wallets: dict[int, dict[str, Decimal]],
+    tokens: dict[int, str],
+    mix: dict[str, int],
+    duration: float,
+    concurrency: int,
+) -> Report:
+    """Send requests of the operations mix from concurrent clients for the duration."""
+    report = Report()
+    names, weights = list(mix), list(mix.values())
+    users = list(wallets)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+
+    async def worker(rng: random.Random) -> None:
+        while loop.time() < deadline:
+            name = rng.choices(names, weights)[0]
+            user_id = rng.choice(users)
+            codes = list(wallets[user_id]) or sorted(DEFAULT_CODES)
+            method, route = OPERATIONS[name]
+            url = route.format(currency=rng.choice(codes), amount="0.01")
+            headers = {"Authorization": f"Bearer {tokens[user_id]}"}
+
+            start = time.perf_counter()
+            try:
+                result = await client.request(method, url, headers=headers)
+                status = str(result.status_code)
+            except httpx.HTTPError as error:
+                status = type(error).__name__
+            report.add(f"{method} {route}", status, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rngs = [random.Random(seed) for seed in range(concurrency)]  # noqa: S311
+    await asyncio.gather(*(worker(rng) for rng in rngs))
+    report.duration = time.perf_counter() - start
+    return report
+
+
+def start_service(url: str, nbp_url: str, workers: int) -> subprocess.Popen[bytes]:
+    """Start service in production mode using NBP Web API stand-in."""
+    host, _, port = httpx.URL(url).netloc.decode().partition(":")
+    env = os.environ | {
+        "WALLET_DEBUG": "no",
+        "WALLET_ACCESS_LOG": "no",
+        "WALLET_NBP_URL": nbp_url,
+        "WALLET_BIND_HOST": host,
+        "WALLET_BIND_PORT": port or "80",
+    }
+    command = "from wallet.cli import service; service()"
+    return subprocess.Popen(  # noqa: S603
+        [sys.executable, "-c", command, "--workers", str(workers)], env=env
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient) -> None:
+    """Wait until the service reports it is ready."""
+    while True:
+        try:
+            result = await client.get("/health/ready")
+        except httpx.TransportError:
+            pass
+        else:
+            if result.is_success:
+                return
+        await asyncio.sleep(0.1)
+
+
+async def drive_load(  # noqa: PLR0913
+    url: str,
+    wallets: dict[int, dict[str, Decimal]],
+    tokens: dict[int, str],
+    weights: dict[str, int],
+    duration: float,
+    concurrency: int,
+) -> Report:
+    """Wait for the service and send load to it."""
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async with asyncio.timeout(60):
+            await wait_ready(client)
+        return await run_load(client, wallets, tokens, weights, duration, concurrency)
+
+
+def get_service_url() -> str:
+    """Get URL of the service started with the current settings."""
+    settings = get_settings()
+    host = "127.0.0.1" if settings.bind_host == "0.0.0.0" else settings.bind_host  # noqa: S104
+    return f"http://{host}:{settings.bind_port}"
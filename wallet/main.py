@@ -1,14 +1,19 @@
 """API entry point."""
 
+import typing as t
+
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 
 from wallet.api.dependencies import lifespan
 
 from .api.auth import exception_handlers as auth_exception_handlers
-from .api.routes import wallet_router
+from .api.health import health_router
+from .api.metrics import MetricsMiddleware, TimingMiddleware, metrics_router
+from .api.routes import SUPPORTED_CURRENCIES_KEY, wallet_router
+from .api.valuation import valuation_router
 from .config import get_settings
-from .rates import NotSupportedError
+from .rates import NotSupportedError, get_registry
 
 
 def create_app() -> FastAPI:
@@ -22,9 +27,27 @@ def create_app() -> FastAPI:
         lifespan=lifespan,
     )
     app.include_router(wallet_router)
+    app.include_router(valuation_router)
+    app.include_router(metrics_router)
+    app.include_router(health_router)
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.openapi = lambda: supported_currencies_openapi(app)  # type: ignore[method-assign]
     return app
 
 
+def supported_currencies_openapi(app: FastAPI) -> dict[str, t.Any]:
+    """Get OpenAPI schema listing currently supported currencies."""
+    schema = FastAPI.openapi(app)
+    codes = sorted(get_registry().codes)
+    for path in schema["paths"].values():
+        for operation in path.values():
+            for parameter in operation.get("parameters", ()):
+                if parameter["schema"].get(SUPPORTED_CURRENCIES_KEY):
+                    parameter["schema"]["enum"] = codes
+    return schema
+
+
 async def not_supported_currency_exception_handler(
     request: Request,  # noqa: ARG001
     exc: NotSupportedError,
@@ -0,0 +1,323 @@
+"""Service metrics in Prometheus text format."""
+
+import asyncio
+import bisect
+import json
+import logging
+import os
+import typing as t
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+from pathlib import Path
+from types import TracebackType
+
+from wallet.config import get_settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+"""Latency histogram buckets upper bounds in seconds."""
+
+Labels = tuple[str, ...]
+
+Sample = tuple[str, dict[str, str], float]
+"""Sample name, labels and value."""
+
+SampleKey = tuple[str, tuple[tuple[str, str], ...]]
+"""Sample name and labels identifying it among workers samples."""
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def escape(value: str) -> str:
+    """Escape label value."""
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def render_family(
+    name: str, kind: str, description: str, samples: Iterable[Sample]
+) -> str:
+    """Render metric family with its samples in the text format."""
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    for sample, labels, value in samples:
+        if labels:
+            pairs = ",".join(f'{key}="{escape(val)}"' for key, val in labels.items())
+            lines.append(f"{sample}{{{pairs}}} {value}")
+        else:
+            lines.append(f"{sample} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class Family(t.NamedTuple):
+    """Metric family with its samples."""
+
+    name: str
+    kind: str
+    description: str
+    samples: list[Sample]
+
+    def render(self) -> str:
+        """Render metric family in the text format."""
+        return render_family(self.name, self.kind, self.description, self.samples)
+
+
+class Counter:
+    """
+    Counter by label values.
+
+    Metrics are updated from the event loop thread only, so no locks are taken and
+    an increment costs a dictionary update.
+    """
+
+    def __init__(self, name: str, description: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values: dict[Labels, float] = {}
+        """Counted values by label values."""
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        """Increment counter with the label values."""
+        self.values[values] = self.values.get(values, 0) + amount
+
+    def collect(self) -> Family:
+        """Collect counter samples."""
+        samples: list[Sample] = [
+            (self.name, dict(zip(self.labels, values, strict=True)), value)
+            for values, value in self.values.items()
+        ]
+        return Family(self.name, "counter", self.description, samples)
+
+    def render(self) -> str:
+        """Render counter in the text format."""
+        return self.collect().render()
+
+
+class Histogram:
+    """
+    Histogram by label values.
+
+    Observation is counted in the bucket it belongs to only, cumulative counts are
+    calculated on rendering.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.counts: dict[Labels, list[int]] = {}
+        """Observations number by bucket (the last one is +Inf) by label values."""
+        self.sums: dict[Labels, float] = {}
+        """Observed values sum by label values."""
+
+    def observe(self, value: float, *values: str) -> None:
+        """Observe value with the label values."""
+        counts = self.counts.get(values)
+        if counts is None:
+            counts = self.counts[values] = [0] * (len(self.buckets) + 1)
+            self.sums[values] = 0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sums[values] += value
+
+    def collect(self) -> Family:
+        """Collect histogram samples."""
+        return Family(self.name, "histogram", self.description, list(self._samples()))
+
+    def render(self) -> str:
+        """Render histogram in the text format."""
+        return self.collect().render()
+
+    def _samples(self) -> t.Iterator[Sample]:
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for values, counts in self.counts.items():
+            labels = dict(zip(self.labels, values, strict=True))
+            total = 0
+            for bound, count in zip(bounds, counts, strict=True):
+                total += count
+                yield f"{self.name}_bucket", {**labels, "le": bound}, total
+            yield f"{self.name}_sum", labels, self.sums[values]
+            yield f"{self.name}_count", labels, total
+
+
+class Metrics:
+    """Service metrics updated on events."""
+
+    def __init__(self) -> None:
+        self.requests = Counter(
+            "wallet_http_requests_total",
+            "HTTP requests by route and response status.",
+            ("method", "route", "status"),
+        )
+        self.request_duration = Histogram(
+            "wallet_http_request_duration_seconds",
+            "HTTP requests duration by route.",
+            ("method", "route"),
+        )
+        self.nbp_requests = Counter(
+            "wallet_nbp_requests_total",
+            "NBP Web API requests by resource and response status (error if none).",
+            ("resource", "status"),
+        )
+        self.nbp_request_duration = Histogram(
+            "wallet_nbp_request_duration_seconds",
+            "NBP Web API requests duration by resource.",
+            ("resource",),
+        )
+
+    def collect(self) -> list[Family]:
+        """Collect metrics samples."""
+        return [
+            metric.collect()
+            for metric in (
+                self.requests,
+                self.request_duration,
+                self.nbp_requests,
+                self.nbp_request_duration,
+            )
+        ]
+
+    def render(self) -> str:
+        """Render metrics in the text format."""
+        return "".join(family.render() for family in self.collect())
+
+
+@lru_cache
+def get_metrics() -> Metrics:
+    """Service metrics getter."""
+    return Metrics()
+
+
+def is_alive(pid: int) -> bool:
+    """Check whether the process is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def aggregate(
+    workers: dict[int, list[Family]], alive: Callable[[int], bool] = is_alive
+) -> list[Family]:
+    """
+    Aggregate metrics of several worker processes by their IDs.
+
+    Counters and histograms are summed, including exited workers ones, so they never go
+    backwards. Gauges describe a process state, so they are labelled by the process ID
+    of running workers only.
+    """
+    families: dict[str, tuple[Family, dict[SampleKey, float]]] = {}
+    for pid, worker in workers.items():
+        running = alive(pid)
+        for family in worker:
+            values = families.setdefault(family.name, (family, {}))[1]
+            for sample, labels, value in family.samples:
+                if family.kind != "gauge":
+                    key = (sample, tuple(labels.items()))
+                    values[key] = values.get(key, 0) + value
+                elif running:
+                    values[(sample, (*labels.items(), ("pid", str(pid))))] = value
+    return [
+        Family(
+            family.name,
+            family.kind,
+            family.description,
+            [
+                (sample, dict(labels), value)
+                for (sample, labels), value in values.items()
+            ],
+        )
+        for family, values in families.values()
+    ]
+
+
+class SharedMetrics:
+    """
+    Metrics of all service worker processes shared through a directory.
+
+    Every worker writes its metrics into its own file (named by its process ID) in the
+    background and on scrape, so the scraped worker renders metrics of all of them.
+    Metrics of other workers are as old as the sharing interval at most.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        collect: Callable[[], list[Family]],
+        interval: float | None = None,
+        pid: int | None = None,
+    ) -> None:
+        self.path = path
+        self.collect = collect
+        self.interval = interval or get_settings().metrics_interval
+        self.pid = pid or os.getpid()
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> t.Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.stop()
+
+    def start(self) -> None:
+        """Start sharing metrics in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="metrics-sharing")
+
+    async def stop(self) -> None:
+        """Stop sharing metrics writing them the last time."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self.write(self.collect())
+
+    async def run(self) -> None:
+        """Write metrics forever."""
+        while True:
+            try:
+                self.write(self.collect())
+            except Exception:
+                logger.exception("Metrics sharing failed")
+            await asyncio.sleep(self.interval)
+
+    def write(self, families: list[Family]) -> None:
+        """Write metrics of this process replacing the file at once."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        temporary = self.path / f".{self.pid}.tmp"
+        temporary.write_text(json.dumps(families))
+        temporary.replace(self.path / f"{self.pid}.json")
+
+    def read(self, families: list[Family]) -> list[Family]:
+        """Aggregate current metrics of this process with all shared ones."""
+        self.write(families)
+        workers = {self.pid: families}
+        for file in self.path.glob("*.json"):
+            if not file.stem.isdigit() or int(file.stem) == self.pid:
+                continue
+            try:
+                workers[int(file.stem)] = [
+                    Family(name, kind, description, [tuple(item) for item in samples])
+                    for name, kind, description, samples in json.loads(file.read_text())
+                ]
+            except (OSError, ValueError):
+                logger.exception("Shared metrics file %s is not valid", file)
+        return aggregate(workers)
+
+
+def create_shared_metrics() -> SharedMetrics | None:
+    """Get metrics shared by service workers (none unless started with several)."""
+    return None
@@ -0,0 +1,410 @@
+"""NBP Web API interaction services."""
+
+import asyncio
+import datetime as dt
+import logging
+import time
+import typing as t
+from dataclasses import replace
+from functools import partial
+
+import httpx
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from wallet.config import get_settings
+from wallet.db import create_engine, get_session
+from wallet.db import services as db_services
+from wallet.db.models import Rate as DbRate
+from wallet.metrics import get_metrics
+from wallet.timing import measure
+
+from .breaker import CircuitBreaker
+from .cache import TABLE_KEY, RateCache, create_cache
+from .calendar import business_days, expected_date, last_business_day
+from .flight import SingleFlight
+from .models import NotSupportedError, Rate, Table
+from .refresher import RateRefresher
+from .registry import CurrencyRegistry, get_registry
+from .snapshot import SharedSnapshot, create_snapshot
+
+__all__ = [
+    "HISTORY_START",
+    "CircuitBreaker",
+    "CurrencyRegistry",
+    "NotSupportedError",
+    "Rate",
+    "RateCache",
+    "RateProvider",
+    "RateRefresher",
+    "SharedSnapshot",
+    "SingleFlight",
+    "Table",
+    "create_cache",
+    "create_client",
+    "create_provider",
+    "create_snapshot",
+    "get_registry",
+    "load_table",
+    "seed_table",
+    "store_table",
+    "update_history",
+]
+
+T = t.TypeVar("T")
+
+logger = logging.getLogger("uvicorn.error")
+
+HISTORY_START = dt.date(2002, 1, 2)
+"""Effective date of the first table C available in NBP Web API."""
+
+HISTORY_SPAN = 93
+"""Maximal number of days NBP Web API serves tables for in a single request."""
+
+
+def create_client() -> httpx.AsyncClient:
+    """Get NBP Web API requests client."""
+    settings = get_settings()
+    limits = httpx.Limits(max_connections=settings.nbp_connection_limit)
+    return httpx.AsyncClient(
+        base_url=settings.nbp_url,
+        headers={"Accept": "application/json"},
+        limits=limits,
+        timeout=settings.nbp_timeout,
+    )
+
+
+class RateProvider:
+    """
+    Exchange rates provider.
+
+    The whole table C is requested at once and every currency lookup is answered from
+    this snapshot, so all rates used together come from the same table. Concurrent
+    requests for the table are coalesced into a single upstream one.
+
+    Once the table is known it is always served immediately: expired snapshot is
+    refreshed in the background while the current one is still used
+    (stale-while-revalidate). The snapshot is replaced as a whole, so a request never
+    sees rates from different tables.
+
+    If DB engine is provided, fetched tables are stored in DB and the stored table is
+    used instead of requesting NBP while it is still the current one. This way a
+    restarted service or other service processes do not request NBP again.
+
+    NBP requests go through the circuit breaker. When NBP is not available, the last
+    known table is used and flagged as stale.
+
+    Supported currencies registry is updated together with the snapshot.
+
+    If shared snapshot is provided, only the process publishing it requests tables,
+    others take them from the shared snapshot (unless it is empty yet). Newer tables
+    published there are picked up on every lookup without waiting for expiration.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        client: httpx.AsyncClient,
+        cache: RateCache,
+        *,
+        flight: SingleFlight | None = None,
+        engine: AsyncEngine | None = None,
+        breaker: CircuitBreaker | None = None,
+        registry: CurrencyRegistry | None = None,
+        snapshot: SharedSnapshot | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.client = client
+        self.cache = cache
+        self.flight = flight or SingleFlight()
+        self.engine = engine
+        self.breaker = breaker or CircuitBreaker(
+            settings.nbp_failure_threshold, settings.nbp_recovery_timeout
+        )
+        self.registry = registry or get_registry()
+        self.snapshot = snapshot
+        self.table: Table | None = None
+        """Current exchange rates table snapshot."""
+        self._background: set[asyncio.Task[Table | None]] = set()
+
+    async def get_table(self) -> Table | None:
+        """Get current exchange rates table if available."""
+        if self.snapshot is not None and not self.snapshot.publisher:
+            shared = self.snapshot.read()
+            if shared is not None and shared is not self.table:
+                self._use(shared)
+        if table := self.cache.get_table():
+            return table
+        if self.table is None:
+            return await self.refresh()
+        self.refresh_soon()
+        return self.table
+
+    async def get_rate(self, currency: str) -> Rate | None:
+        """Get currency exchange rate if the table is available."""
+        table = await self.get_table()
+        return table.get_rate(currency) if table else None
+
+    async def refresh(self) -> Table | None:
+        """Request the table from NBP replacing the current snapshot on success."""
+        return await self.flight.run(TABLE_KEY, self._fetch)
+
+    def refresh_soon(self) -> None:
+        """Start the table refresh in the background."""
+        task = asyncio.ensure_future(self.refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def aclose(self) -> None:
+        """Cancel background refreshes."""
+        for task in self._background:
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _fetch(self) -> Table | None:
+        if (
+            self.snapshot is not None
+            and not self.snapshot.acquire()
+            and (shared := self.snapshot.read())
+        ):
+            self._use(shared)
+            return shared
+
+        stored = await self._load()
+        if stored and stored.date >= expected_date(dt.datetime.now(dt.UTC)):
+            table = stored
+        elif requested := await self._request():
+            table = requested
+            if stored is None or table.date > stored.date:
+                await self._store(table)
+        else:
+            known = [table for table in (stored, self.table) if table]
+            if not known:
+                return None
+            table = replace(max(known, key=lambda table: table.date), stale=True)
+
+        self._use(table)
+        if self.snapshot is not None and self.snapshot.publisher:
+            self.snapshot.publish(table)
+        return table
+
+    def _use(self, table: Table) -> None:
+        self.cache.put_table(table)
+        self.table = table
+        self.registry.update(table)
+
+    async def fetch_history(self, start: dt.date, end: dt.date) -> list[Table] | None:
+        """Request tables published within the period unless NBP is not available."""
+        return await self._call(partial(fetch_tables, self.client, start, end))
+
+    async def _request(self) -> Table | None:
+        return await self._call(partial(fetch_table, self.client))
+
+    async def _call(self, fetch: t.Callable[[], t.Awaitable[T | None]]) -> T | None:
+        if not self.breaker.allow():
+            return None
+
+        try:
+            result = await fetch()
+        except httpx.HTTPError as exc:
+            logger.error("NBP API request failed: %r", exc)  # noqa: TRY400
+            result = None
+        except Exception:
+            # unexpected payload must not leave the half-open circuit without result
+            logger.exception("NBP API response is not valid")
+            result = None
+
+        self.breaker.record(success=result is not None)
+        return result
+
+    async def _load(self) -> Table | None:
+        if self.engine is None:
+            return None
+        try:
+            return await load_table(self.engine)
+        except (SQLAlchemyError, OSError) as exc:
+            logger.error("Exchange rates loading failed: %r", exc)  # noqa: TRY400
+            return None
+
+    async def _store(self, table: Table) -> None:
+        if self.engine is None:
+            return
+        try:
+            await store_table(self.engine, table)
+        except (SQLAlchemyError, OSError) as exc:
+            logger.error("Exchange rates storing failed: %r", exc)  # noqa: TRY400
+
+
+def create_provider() -> RateProvider:
+    """Get exchange rates provider."""
+    return RateProvider(create_client(), create_cache())
+
+
+async def load_table(engine: AsyncEngine) -> Table | None:
+    """Get the latest exchange rates table stored in DB."""
+    async with get_session(engine) as session:
+        db_rates = await db_services.get_rates(session)
+
+    if not db_rates:
+        return None
+
+    date = db_rates[0].date
+    return Table(
+        no=db_rates[0].table_no,
+        date=date,
+        rates={
+            db_rate.code: Rate(code=db_rate.code, ask=db_rate.ask, date=date)
+            for db_rate in db_rates
+        },
+    )
+
+
+async def store_table(engine: AsyncEngine, table: Table) -> None:
+    """Store exchange rates table in DB."""
+    await store_tables(engine, [table])
+
+
+async def store_tables(engine: AsyncEngine, tables: list[Table]) -> None:
+    """Store several exchange rates tables in DB at once."""
+    db_rates = [
+        DbRate(code=rate.code, ask=rate.ask, date=table.date, table_no=table.no)
+        for table in tables
+        for rate in table.rates.values()
+    ]
+    async with get_session(engine) as session:
+        await db_services.add_rates(db_rates, session)
+
+
+async def update_history(
+    provider: RateProvider, engine: AsyncEngine, start: dt.date, end: dt.date
+) -> bool:
+    """
+    Store exchange rates tables of the period not stored in DB yet.
+
+    The period is extended back to the last business day, so the rates of every day of
+    it are known. Consecutive business days without stored tables are grouped into
+    spans up to the NBP limit and requested concurrently via the provider (through its
+    circuit breaker, coalescing requests for the same span). Spans never cover stored
+    days, so every published table is requested once. Returns whether all requested
+    spans were fetched (immediately failing while NBP is not available).
+    """
+    start = last_business_day(start)
+    end = min(end, expected_date(dt.datetime.now(dt.UTC)))
+    async with get_session(engine) as session:
+        stored = await db_services.get_rate_dates(start, end, session)
+
+    spans: list[tuple[dt.date, dt.date]] = []
+    previous = None
+    for day in business_days(start, end):
+        if day in stored:
+            previous = None
+            continue
+        if previous and (day - spans[-1][0]).days < HISTORY_SPAN:
+            spans[-1] = (spans[-1][0], day)
+        else:
+            spans.append((day, day))
+        previous = day
+
+    async def fetch(first: dt.date, last: dt.date) -> bool:
+        tables = await provider.fetch_history(first, last)
+        if tables is None:
+            return False
+        await store_tables(engine, tables)
+        return True
+
+    results = await asyncio.gather(
+        *(
+            provider.flight.run(f"history:{first}:{last}", partial(fetch, first, last))
+            for first, last in spans
+        )
+    )
+    return all(results)
+
+
+async def seed_table() -> Table | None:
+    """Request the current exchange rates table from NBP and store it in DB."""
+    engine = create_engine()
+    try:
+        async with create_client() as client:
+            table = await fetch_table(client)
+        if table:
+            await store_table(engine, table)
+    finally:
+        await engine.dispose()
+    return table
+
+
+async def fetch_table(client: httpx.AsyncClient) -> Table | None:
+    """Request current exchange rates table from NBP Web API."""
+    result = await request(client, "table", "/exchangerates/tables/C/")
+    data = parse_response(result)
+    if data is None:
+        return None
+
+    table = data[0]
+    date = dt.date.fromisoformat(table["effectiveDate"])
+    return Table(
+        no=table["no"],
+        date=date,
+        rates={
+            rate["code"]: Rate(code=rate["code"], ask=rate["ask"], date=date)
+            for rate in table["rates"]
+        },
+    )
+
+
+async def fetch_tables(
+    client: httpx.AsyncClient, start: dt.date, end: dt.date
+) -> list[Table] | None:
+    """Request exchange rates tables published within the period from NBP Web API."""
+    url = f"/exchangerates/tables/C/{start.isoformat()}/{end.isoformat()}/"
+    result = await request(client, "tables", url)
+    if result.status_code == httpx.codes.NOT_FOUND:
+        return []  # no table was published within the period
+    data = parse_response(result)
+    if data is None:
+        return None
+    return [
+        Table(
+            no=table["no"],
+            date=(date := dt.date.fromisoformat(table["effectiveDate"])),
+            rates={
+                rate["code"]: Rate(code=rate["code"], ask=rate["ask"], date=date)
+                for rate in table["rates"]
+            },
+        )
+        for table in data
+    ]
+
+
+async def request(client: httpx.AsyncClient, resource: str, url: str) -> httpx.Response:
+    """Request NBP Web API resource counting requests by response status."""
+    metrics = get_metrics()
+    start = time.perf_counter()
+    try:
+        with measure("nbp"):
+            result = await client.get(url)
+    except httpx.HTTPError:
+        metrics.nbp_requests.inc(resource, "error")
+        raise
+    finally:
+        metrics.nbp_request_duration.observe(time.perf_counter() - start, resource)
+    metrics.nbp_requests.inc(resource, str(result.status_code))
+    return result
+
+
+def parse_response(result: httpx.Response) -> t.Any:  # noqa: ANN401
+    """Get NBP Web API response data logging unsuccessful ones."""
+    if result.is_success:
+        try:
+            return result.json()
+        except Exception:  # noqa: BLE001, S110
+            pass
+
+    logger.error(
+        "NBP API request %s resulted in %s %s: %s",
+        result.url,
+        result.status_code,
+        result.reason_phrase,
+        result.content,
+    )
+    return None
@@ -0,0 +1,65 @@
+"""NBP Web API circuit breaker."""
+
+import time
+import typing as t
+from enum import StrEnum
+
+
+class State(StrEnum):
+    """Circuit breaker states."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for upstream requests.
+
+    The circuit opens after the number of consecutive failures reaches the threshold.
+    While it is open requests are not allowed at all, so callers fail fast instead of
+    waiting for timeouts. After the recovery timeout a single probe request is allowed
+    (half-open state): its success closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        recovery_timeout: float,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.state = State.CLOSED
+        self.failures = 0
+        """Number of consecutive failures."""
+        self.rejected = 0
+        """Number of requests rejected while the circuit is open."""
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Check whether a request is allowed now."""
+        if self.state is State.CLOSED:
+            return True
+        if (
+            self.state is State.OPEN
+            and self.clock() - self._opened_at >= self.recovery_timeout
+        ):
+            self.state = State.HALF_OPEN
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, *, success: bool) -> None:
+        """Record request result."""
+        if success:
+            self.state = State.CLOSED
+            self.failures = 0
+            return
+
+        self.failures += 1
+        if self.state is State.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = State.OPEN
+            self._opened_at = self.clock()
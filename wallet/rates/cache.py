@@ -0,0 +1,54 @@
+"""In-process exchange rates cache."""
+
+import datetime as dt
+
+from .calendar import expiration
+from .models import Table
+
+TABLE_KEY = "table"
+"""Key the whole table C snapshot requests are coalesced by."""
+
+
+class RateCache:
+    """
+    Exchange rates table cache.
+
+    The table is kept until the next NBP table publication instead of a fixed TTL, so
+    it is requested from NBP at most once per business day (unless the table
+    publication is late).
+    """
+
+    def __init__(self) -> None:
+        self._entry: tuple[Table, dt.datetime] | None = None
+        self.hits = 0
+        """Number of lookups answered from the cache."""
+        self.misses = 0
+        """Number of lookups missing the cache or finding an expired entry."""
+
+    def get_table(self, now: dt.datetime | None = None) -> Table | None:
+        """Get cached table snapshot if it is not expired yet."""
+        if self._entry and self._entry[1] > (now or dt.datetime.now(dt.UTC)):
+            self.hits += 1
+            return self._entry[0]
+        self.misses += 1
+        return None
+
+    def put_table(self, table: Table, now: dt.datetime | None = None) -> None:
+        """Cache table snapshot until its expiration according to the schedule."""
+        now = now or dt.datetime.now(dt.UTC)
+        self._entry = (table, expiration(table.date, now))
+
+    def clear(self) -> None:
+        """Drop the cached table."""
+        self._entry = None
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of lookups answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def create_cache() -> RateCache:
+    """Get exchange rates cache."""
+    return RateCache()
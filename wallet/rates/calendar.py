@@ -0,0 +1,125 @@
+"""NBP exchange rates publication schedule."""
+
+import datetime as dt
+import typing as t
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+WARSAW = ZoneInfo("Europe/Warsaw")
+"""NBP publication schedule timezone."""
+
+PUBLICATION_TIME = dt.time(8, 15)
+"""Local time table C is published by on business days."""
+
+PUBLICATION_WINDOW = dt.timedelta(minutes=30)
+"""Period before the publication time table C may appear within."""
+
+LATE_RETRY = dt.timedelta(minutes=5)
+"""Delay before asking again for a table expected to be published already."""
+
+ONE_DAY = dt.timedelta(days=1)
+
+
+def easter(year: int) -> dt.date:
+    """Calculate Easter Sunday date (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return dt.date(year, month, day + 1)
+
+
+@lru_cache
+def holidays(year: int) -> frozenset[dt.date]:
+    """Get Polish public holidays NBP does not publish exchange rates on."""
+    easter_sunday = easter(year)
+    days = {
+        dt.date(year, 1, 1),
+        dt.date(year, 1, 6),
+        easter_sunday,
+        easter_sunday + ONE_DAY,
+        easter_sunday + dt.timedelta(days=49),
+        easter_sunday + dt.timedelta(days=60),
+        dt.date(year, 5, 1),
+        dt.date(year, 5, 3),
+        dt.date(year, 8, 15),
+        dt.date(year, 11, 1),
+        dt.date(year, 11, 11),
+        dt.date(year, 12, 25),
+        dt.date(year, 12, 26),
+    }
+    if year >= 2025:  # noqa: PLR2004  # Christmas Eve is a public holiday since 2025
+        days.add(dt.date(year, 12, 24))
+    return frozenset(days)
+
+
+def is_business_day(day: dt.date) -> bool:
+    """Check whether NBP publishes exchange rates on the day."""
+    return day.weekday() < 5 and day not in holidays(day.year)  # noqa: PLR2004
+
+
+def publication(day: dt.date) -> dt.datetime:
+    """Get table publication moment on the day."""
+    return dt.datetime.combine(day, PUBLICATION_TIME, tzinfo=WARSAW)
+
+
+def next_publication(moment: dt.datetime) -> dt.datetime:
+    """Get the first table publication moment strictly after the given one."""
+    day = moment.astimezone(WARSAW).date()
+    while not is_business_day(day) or publication(day) <= moment:
+        day += ONE_DAY
+    return publication(day)
+
+
+def last_publication(moment: dt.datetime) -> dt.datetime:
+    """Get the latest table publication moment not after the given one."""
+    day = moment.astimezone(WARSAW).date()
+    while not is_business_day(day) or publication(day) > moment:
+        day -= ONE_DAY
+    return publication(day)
+
+
+def expiration(effective_date: dt.date, now: dt.datetime) -> dt.datetime:
+    """
+    Get moment exchange rates with the effective date become outdated.
+
+    Rates are valid until the next table publication (tables published ahead of the
+    schedule are valid until the following one). If a newer table should have been
+    published already but the rates are still older, the table is late and rates
+    should be asked for again shortly.
+    """
+    if effective_date < last_publication(now).date():
+        return now + LATE_RETRY
+    return next_publication(max(now, publication(effective_date)))
+
+
+def expected_date(moment: dt.datetime) -> dt.date:
+    """Get effective date of the newest table which may be published by the moment."""
+    return last_publication(moment + PUBLICATION_WINDOW).date()
+
+
+def next_window(moment: dt.datetime) -> dt.datetime:
+    """Get start of the next publication window after the moment."""
+    return next_publication(moment + PUBLICATION_WINDOW) - PUBLICATION_WINDOW
+
+
+def last_business_day(day: dt.date) -> dt.date:
+    """Get the latest business day not after the given one."""
+    while not is_business_day(day):
+        day -= ONE_DAY
+    return day
+
+
+def business_days(start: dt.date, end: dt.date) -> t.Iterator[dt.date]:
+    """Iterate over business days of the period including its ends."""
+    day = start
+    while day <= end:
+        if is_business_day(day):
+            yield day
+        day += ONE_DAY
@@ -0,0 +1,38 @@
+"""Concurrent upstream requests coalescing."""
+
+import asyncio
+import typing as t
+
+T = t.TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight call.
+
+    The first caller starts the call, callers arriving while it is in flight just wait
+    for its result (or exception). The call is not cancelled when some of the waiting
+    callers are cancelled, so the rest still get the result.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Task[t.Any]] = {}
+        self.coalesced = 0
+        """Number of calls served by joining another in-flight call."""
+
+    async def run(
+        self, key: str, call: t.Callable[[], t.Coroutine[t.Any, t.Any, T]]
+    ) -> T:
+        """Run the call unless a call for the same key is in flight already."""
+        if (task := self._calls.get(key)) is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return t.cast(T, await asyncio.shield(task))
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently in flight."""
+        return len(self._calls)
@@ -0,0 +1,49 @@
+"""Exchange rates data models."""
+
+import datetime as dt
+from dataclasses import dataclass, replace
+
+
+@dataclass(kw_only=True)
+class Rate:
+    """Exchange rate info."""
+
+    code: str
+    ask: float
+    date: dt.date
+    stale: bool = False
+
+
+class NotSupportedError(ValueError):
+    """Not supported currency."""
+
+    def __init__(self, code: str) -> None:
+        super().__init__(f'Not supported currency "{code}"')
+
+
+@dataclass(kw_only=True)
+class Table:
+    """Exchange rates table snapshot."""
+
+    no: str
+    """Table number."""
+
+    date: dt.date
+    """Table publication effective date."""
+
+    rates: dict[str, Rate]
+    """Exchange rates by ISO 4217 currency code."""
+
+    stale: bool = False
+    """Table is known to be outdated since NBP Web API is not available."""
+
+    def find(self, code: str) -> Rate | None:
+        """Find currency exchange rate in the table."""
+        rate = self.rates.get(code)
+        return replace(rate, stale=True) if rate and self.stale else rate
+
+    def get_rate(self, code: str) -> Rate:
+        """Get currency exchange rate from the table."""
+        if rate := self.find(code):
+            return rate
+        raise NotSupportedError(code)
@@ -0,0 +1,80 @@
+"""Background exchange rates refreshing."""
+
+import asyncio
+import datetime as dt
+import logging
+import typing as t
+from types import TracebackType
+
+from wallet.config import get_settings
+
+from .calendar import expected_date, next_window
+
+if t.TYPE_CHECKING:
+    from . import RateProvider
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class RateRefresher:
+    """
+    Background task keeping the provider table snapshot up to date.
+
+    The table is requested right after the start, then the task sleeps until the next
+    NBP publication window and polls for the new table until it is published. This way
+    the snapshot is replaced before the previous one expires and requests never wait
+    for NBP.
+    """
+
+    def __init__(
+        self, provider: "RateProvider", interval: dt.timedelta | None = None
+    ) -> None:
+        self.provider = provider
+        self.interval = interval or dt.timedelta(
+            seconds=get_settings().nbp_refresh_interval
+        )
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> t.Self:
+        self.start()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        await self.stop()
+
+    def start(self) -> None:
+        """Start refreshing in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="rate-refresher")
+
+    async def stop(self) -> None:
+        """Stop refreshing and wait for the task to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.provider.aclose()
+
+    async def run(self) -> None:
+        """Refresh the table forever."""
+        while True:
+            delay = await self.step()
+            await asyncio.sleep(delay)
+
+    async def step(self, now: dt.datetime | None = None) -> float:
+        """Refresh the table if a new one is expected returning seconds to wait."""
+        now = now or dt.datetime.now(dt.UTC)
+        table = self.provider.table
+        if table is not None and table.date >= expected_date(now):
+            return (next_window(now) - now).total_seconds()
+
+        try:
+            await self.provider.refresh()
+        except Exception:
+            logger.exception("Exchange rates refresh failed")
+        return self.interval.total_seconds()
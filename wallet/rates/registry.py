@@ -0,0 +1,57 @@
+"""Supported currencies registry."""
+
+from collections.abc import Iterable
+from functools import lru_cache
+
+from .models import NotSupportedError, Table
+
+DEFAULT_CODES = frozenset(
+    {
+        "AUD",
+        "CAD",
+        "CHF",
+        "CZK",
+        "DKK",
+        "EUR",
+        "GBP",
+        "HUF",
+        "JPY",
+        "NOK",
+        "SEK",
+        "USD",
+        "XDR",
+    }
+)
+"""Currencies table C is known to contain, used until the table is requested."""
+
+
+class CurrencyRegistry:
+    """
+    Supported currency codes.
+
+    Codes are taken from the latest exchange rates table, so not supported currencies
+    could be rejected without any upstream request.
+    """
+
+    def __init__(self, codes: Iterable[str] = DEFAULT_CODES) -> None:
+        self.codes = frozenset(codes)
+        """Supported ISO 4217 codes."""
+
+    def __contains__(self, code: object) -> bool:
+        return code in self.codes
+
+    def update(self, table: Table) -> None:
+        """Replace supported codes with ones from the table."""
+        if table.rates:
+            self.codes = frozenset(table.rates)
+
+    def check(self, code: str) -> None:
+        """Raise error if the currency is not supported."""
+        if code not in self.codes:
+            raise NotSupportedError(code)
+
+
+@lru_cache
+def get_registry() -> CurrencyRegistry:
+    """Supported currencies registry getter."""
+    return CurrencyRegistry()
@@ -0,0 +1,127 @@
+"""Exchange rates table snapshot shared between service processes."""
+
+import datetime as dt
+import fcntl
+import mmap
+import os
+import struct
+
+from wallet.config import get_settings
+
+from .models import Rate, Table
+
+GENERATION = struct.Struct("<Q")
+"""Snapshot generation counter layout (odd while the snapshot is being written)."""
+
+HEADER = struct.Struct("<Q16sI?xH")
+"""Snapshot header layout: generation, table number, date ordinal, stale, rates."""
+
+RATE = struct.Struct("<4sd")
+"""Exchange rate layout: currency code, ask."""
+
+MAX_RATES = 64
+"""Maximal number of exchange rates a snapshot can hold."""
+
+SIZE = HEADER.size + RATE.size * MAX_RATES
+"""Snapshot file size in bytes."""
+
+
+class SharedSnapshot:
+    """
+    Exchange rates table snapshot in a memory-mapped file.
+
+    Only one process publishes tables into the snapshot: the one holding an exclusive
+    lock on the file. Other processes only read it, so the table is requested from NBP
+    once regardless of the number of service workers.
+
+    Readers never block. The generation counter is incremented before and after every
+    write, so a reader checks it first and decodes the mapped memory only when the
+    generation has changed since the previous read. A write in progress (odd
+    generation) or a write finished while decoding (generation changed) is not waited
+    for: the previously read table is returned instead.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < SIZE:
+            os.ftruncate(self._fd, SIZE)
+        self._map = mmap.mmap(self._fd, SIZE)
+        self.publisher = False
+        """This process holds the lock and publishes tables."""
+        self.generation = 0
+        """Generation of the last table read."""
+        self.table: Table | None = None
+        """The last table read."""
+
+    def acquire(self) -> bool:
+        """Try to become the publisher without waiting."""
+        if not self.publisher:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            self.publisher = True
+        return True
+
+    def read(self) -> Table | None:
+        """Get the latest published table (or the last one read if being written)."""
+        (generation,) = GENERATION.unpack_from(self._map)
+        if generation == self.generation or generation % 2:
+            return self.table
+
+        _, no, ordinal, stale, count = HEADER.unpack_from(self._map)
+        date = dt.date.fromordinal(ordinal)
+        rates = {}
+        for index in range(min(count, MAX_RATES)):
+            code, ask = RATE.unpack_from(self._map, HEADER.size + RATE.size * index)
+            code = code.rstrip(b"\0").decode()
+            rates[code] = Rate(code=code, ask=ask, date=date)
+
+        if GENERATION.unpack_from(self._map) != (generation,):
+            return self.table
+
+        self.generation = generation
+        self.table = Table(
+            no=no.rstrip(b"\0").decode(), date=date, rates=rates, stale=stale
+        )
+        return self.table
+
+    def publish(self, table: Table) -> None:
+        """Write the table into the snapshot."""
+        if not self.publisher:
+            raise RuntimeError("Snapshot lock is not acquired")
+        if len(table.rates) > MAX_RATES:
+            raise ValueError(f"Snapshot can hold {MAX_RATES} exchange rates at most")
+
+        (generation,) = GENERATION.unpack_from(self._map)
+        generation += 1 if generation % 2 == 0 else 2
+        GENERATION.pack_into(self._map, 0, generation)
+        HEADER.pack_into(
+            self._map,
+            0,
+            generation,
+            table.no.encode(),
+            table.date.toordinal(),
+            table.stale,
+            len(table.rates),
+        )
+        for index, rate in enumerate(table.rates.values()):
+            offset = HEADER.size + RATE.size * index
+            RATE.pack_into(self._map, offset, rate.code.encode(), rate.ask)
+        GENERATION.pack_into(self._map, 0, generation + 1)
+
+        self.generation = generation + 1
+        self.table = table
+
+    def close(self) -> None:
+        """Unmap the snapshot releasing the lock."""
+        self._map.close()
+        os.close(self._fd)
+        self.publisher = False
+
+
+def create_snapshot() -> SharedSnapshot | None:
+    """Get shared exchange rates snapshot if configured."""
+    path = get_settings().nbp_snapshot
+    return SharedSnapshot(path) if path else None
@@ -0,0 +1,91 @@
+"""Request processing phases timing."""
+
+import time
+import typing as t
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+
+PHASES = ("auth", "db", "nbp", "render")
+"""Measured request processing phases in the reporting order."""
+
+
+class Timings:
+    """Request processing time spent in phases."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        """Request processing start time."""
+        self.phases: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        """Time in seconds spent in phases."""
+        self.queries = 0
+        """Number of DB queries executed."""
+
+    @property
+    def total(self) -> float:
+        """Time in seconds since the request processing start."""
+        return time.perf_counter() - self.start
+
+    def header(self) -> str:
+        """Render Server-Timing header value (durations in milliseconds)."""
+        metrics = [
+            f"{phase};dur={duration * 1000:.1f}"
+            for phase, duration in self.phases.items()
+            if duration
+        ]
+        if self.queries:
+            metrics.append(f'queries;desc="{self.queries} DB queries"')
+        metrics.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+current_timings: ContextVar[Timings | None] = ContextVar(
+    "current_timings", default=None
+)
+"""Timings of the request being processed (none outside of requests)."""
+
+
+@contextmanager
+def measure(phase: str) -> t.Iterator[None]:
+    """Add time spent inside the block to the current request phase."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Measure DB queries execution time of the current request via engine events."""
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+def before_cursor_execute(conn: Connection, *_: t.Any) -> None:  # noqa: ANN401
+    """Remember query start time."""
+    if current_timings.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn: Connection, *_: t.Any) -> None:  # noqa: ANN401
+    """Add query execution time to the current request DB phase."""
+    timings = current_timings.get()
+    if timings is not None and (starts := conn.info.get("query_start")):
+        timings.phases["db"] += time.perf_counter() - starts.pop()
+        timings.queries += 1
+
+
+def handle_error(context: ExceptionContext) -> None:
+    """Forget failed query start time."""
+    if context.connection is not None and (
+        starts := context.connection.info.get("query_start")
+    ):
+        starts.pop()